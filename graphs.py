@@ -0,0 +1,67 @@
+"""
+Tools for the graph archive directory.
+"""
+import argparse
+
+import codecs
+import os
+from loader.archive import GraphArchive
+from loader.namespace import ns_manager
+from loader.snapshot import write_snapshot, snapshot_triples
+from rdflib import Graph
+
+
+def convert(graph_dir, remove=False):
+    """
+    Converts archived turtle graphs (<prefix>-<timestamp>.ttl) to snapshots (<prefix>-<timestamp>.snap).
+
+    Manifests are updated to reference the snapshots.
+    """
+    filenames = sorted(os.listdir(graph_dir))
+    manifest_prefixes = [os.path.splitext(filename)[0] for filename in filenames if filename.endswith(".manifest")]
+    for filename in filenames:
+        name, ext = os.path.splitext(filename)
+        snapshot_filepath = os.path.join(graph_dir, name + ".snap")
+        if ext == ".ttl" and not os.path.exists(snapshot_filepath):
+            g = Graph(namespace_manager=ns_manager)
+            g.parse(os.path.join(graph_dir, filename), format="turtle")
+            print "Converting %s triples in %s" % (len(g), filename)
+            write_snapshot(g, snapshot_filepath)
+            for prefix in manifest_prefixes:
+                GraphArchive(graph_dir, prefix).replace_base(filename, name + ".snap")
+            if remove:
+                os.remove(os.path.join(graph_dir, filename))
+
+
+def export(snapshot_filepath, output_dir):
+    """
+    Exports a snapshot as turtle.
+    """
+    g = Graph(namespace_manager=ns_manager)
+    g += snapshot_triples(snapshot_filepath)
+    filename = os.path.splitext(os.path.basename(snapshot_filepath))[0] + ".ttl"
+    print "Exporting %s triples to %s" % (len(g), filename)
+    with codecs.open(os.path.join(output_dir, filename), "w") as out:
+        g.serialize(format="turtle", destination=out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command")
+
+    default_graph_dir = "/usr/local/vivo/graphs"
+    convert_parser = subparsers.add_parser("convert", help="Convert archived turtle graphs to snapshots.")
+    convert_parser.add_argument("--graph-dir", default=default_graph_dir, dest="graph_dir",
+                                help="Directory where graphs are archived. Default is %s." % default_graph_dir)
+    convert_parser.add_argument("--remove", action="store_true", help="Remove the turtle graphs once converted.")
+
+    export_parser = subparsers.add_parser("export", help="Export a snapshot as turtle.")
+    export_parser.add_argument("snapshot", help="The snapshot file.")
+    export_parser.add_argument("--output-dir", default=".", dest="output_dir",
+                               help="Directory to write the turtle to. Default is the current directory.")
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        convert(args.graph_dir, remove=args.remove)
+    else:
+        export(args.snapshot, args.output_dir)
@@ -1,5 +1,8 @@
 import argparse
 import datetime
+import multiprocessing
+import shutil
+import tempfile
 import time
 from collections import OrderedDict
 import os
@@ -9,47 +12,280 @@ import loader.fis_load as fis_load
 import orcid2vivo_loader
 from loader import banner_load, mygw_load
 from loader.fis_entity import *
-from loader.sparql import load_previous_graph, sparql_load, sparql_delete, serialize
-from rdflib.compare import graph_diff
-from loader.utility import remove_extra_args, get_netid_lookup, warning_log, get_faculty_gwids, get_non_faculty_gwids, \
-    mediaexpert_intersection, get_skip_name_gwids
+from loader.diff import graph_diff, triples_to_graph, sort_ntriples, stream_graph_diff
+from loader.journal import ChunkJournal
+from loader.fingerprint import SourceFingerprint, fingerprint, code_version
+from loader.archive import GraphArchive
+from loader.sparql import sparql_load, sparql_insert, sparql_delete, SparqlEndpoint, AdaptiveSplitSize, \
+    SparqlLoadSink
+from loader.sink import NTriplesSink, TeeSink
+from loader.ntriples import NTriplesFile
+from loader.entity import shared_entities
+from loader.schedule import DataTypeScheduler
+from loader.columns import column_cache
+from loader.gwids import GwidSet
+from loader.utility import remove_extra_args, warning_log, DataContext, identifier_cache
 
 
-def process_graph(g, local_args):
+def process_graph(g, local_args, sparql_endpoint):
+    """
+    Diff, load and archive a graph.
+
+    :return: True if the graph was loaded and archived
+    """
     # G is none if an error occurred.  This leaves the graphs unchanged.
     if g is not None:
+        # Acknowledged chunks of an interrupted load are in VIVO, but not in the archive.
+        journal = None
+        if local_args.perform_load and local_args.perform_serialize:
+            journal = ChunkJournal(local_args.graph_dir, local_args.graph)
+        archive = GraphArchive(local_args.graph_dir, local_args.graph, archive_format=local_args.archive_format,
+                               base_interval=local_args.base_interval, retain_bases=local_args.retain_bases)
+
+        if local_args.stream_diff:
+            return stream_process_graph(g, local_args, sparql_endpoint, journal, archive)
+
         if local_args.perform_diff:
             # Load the previous graph
-            prev_g = load_previous_graph(local_args.graph_dir, local_args.graph)
+            prev_g = archive.load()
         else:
             prev_g = Graph(namespace_manager=ns_manager)
+        if journal is not None:
+            journal.apply(prev_g)
 
         # Find the diff
-        (g_both, g_del, g_add) = graph_diff(prev_g, g)
-        g_add.namespace_manager = ns_manager
-        g_del.namespace_manager = ns_manager
+        (del_triples, add_triples) = graph_diff(prev_g, g)
 
         # Print the diff
-        print "To add %s triples." % len(g_add)
+        print "To add %s triples." % len(add_triples)
         if local_args.print_triples:
-            print g_add.serialize(format="turtle")
-        print "To delete %s triples." % len(g_del)
+            print triples_to_graph(add_triples).serialize(format="turtle")
+        print "To delete %s triples." % len(del_triples)
         if local_args.print_triples:
-            print g_del.serialize(format="turtle")
+            print triples_to_graph(del_triples).serialize(format="turtle")
 
-        if local_args.perform_load:
-            if len(g_add) > 0:
-                sparql_load(g_add, local_args.htdocs_dir, local_args.endpoint, local_args.username, local_args.password,
-                            split_size=local_args.split_size)
-            if len(g_del) > 0:
-                sparql_delete(g_del, local_args.endpoint, local_args.username, local_args.password,
-                              split_size=local_args.delete_split_size)
+        loaded = load_diff(add_triples, del_triples, local_args, sparql_endpoint, journal)
 
         # Save to graphs archive directory
         if local_args.perform_load and local_args.perform_serialize:
-            serialize(g, local_args.graph_dir, local_args.graph)
+            if loaded:
+                archive.save(g, journal, full=not local_args.perform_diff)
+                return True
+            else:
+                not_archived(local_args)
     else:
         print "Performing no additions or deletions due to an error."
+    return False
+
+
+def stream_process_graph(g, local_args, sparql_endpoint, journal, archive):
+    # The new and previous graphs are sorted N-Triples files, so the diff is a merge.
+    work_dir = tempfile.mkdtemp(dir=local_args.graph_dir, prefix=".%s-" % local_args.graph)
+    try:
+        sorted_file = sort_ntriples(g, os.path.join(work_dir, "graph.nt"))
+        prev_file = None
+        logs = []
+        if local_args.perform_diff:
+            (prev_file, logs) = archive.load_sorted(work_dir)
+        if journal is not None:
+            logs.append(journal)
+
+        # Find the diff
+        (del_file, add_file) = stream_graph_diff(prev_file, sorted_file, work_dir, logs=logs)
+
+        # Print the diff
+        print "To add %s triples." % len(add_file)
+        if local_args.print_triples:
+            print "".join(add_file.raw_lines())
+        print "To delete %s triples." % len(del_file)
+        if local_args.print_triples:
+            print "".join(del_file.raw_lines())
+
+        loaded = load_diff(add_file, del_file, local_args, sparql_endpoint, journal)
+
+        # Save to graphs archive directory
+        if local_args.perform_load and local_args.perform_serialize:
+            if loaded:
+                archive.save_sorted(sorted_file, journal, full=not local_args.perform_diff)
+                return True
+            else:
+                not_archived(local_args)
+        return False
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def load_diff(add_triples, del_triples, local_args, sparql_endpoint, journal):
+    """
+    Load the triples to add and delete the triples to delete.
+
+    :return: True if all splits succeeded
+    """
+    loaded = True
+    if local_args.perform_load:
+        if len(add_triples) > 0:
+            if local_args.load_mode == "insert":
+                loaded = sparql_insert(add_triples, sparql_endpoint, split_size=local_args.split_size,
+                                       concurrency=local_args.load_concurrency,
+                                       split_bytes=local_args.split_bytes, journal=journal,
+                                       retries=local_args.retries,
+                                       retry_backoff=local_args.retry_backoff) and loaded
+            else:
+                loaded = sparql_load(add_triples, local_args.htdocs_dir, sparql_endpoint,
+                                     split_size=local_args.split_size,
+                                     concurrency=local_args.load_concurrency,
+                                     split_bytes=local_args.split_bytes, journal=journal,
+                                     retries=local_args.retries,
+                                     retry_backoff=local_args.retry_backoff) and loaded
+        if len(del_triples) > 0:
+            loaded = sparql_delete(del_triples, sparql_endpoint, split_size=local_args.delete_split_size,
+                                   split_bytes=local_args.delete_split_bytes, journal=journal,
+                                   retries=local_args.retries, retry_backoff=local_args.retry_backoff) and loaded
+    return loaded
+
+
+def stream_load_graph(func, func_args, local_args, sparql_endpoint):
+    """
+    Load everything for a data type without building a graph.
+
+    The triples are sent to VIVO in splits as the load function emits them. If serializing, they are also written
+    to a file, which is sorted on disk and archived.
+
+    :return: True if the graph was loaded and archived
+    """
+    journal = None
+    archive = None
+    if local_args.perform_serialize:
+        journal = ChunkJournal(local_args.graph_dir, local_args.graph)
+        archive = GraphArchive(local_args.graph_dir, local_args.graph, archive_format=local_args.archive_format,
+                               base_interval=local_args.base_interval, retain_bases=local_args.retain_bases)
+    work_dir = tempfile.mkdtemp(dir=local_args.graph_dir, prefix=".%s-" % local_args.graph)
+    try:
+        load_sink = SparqlLoadSink(sparql_endpoint,
+                                   htdocs_dir=local_args.htdocs_dir if local_args.load_mode == "load" else None,
+                                   split_size=local_args.split_size, split_bytes=local_args.split_bytes,
+                                   concurrency=local_args.load_concurrency, journal=journal,
+                                   retries=local_args.retries, retry_backoff=local_args.retry_backoff)
+        archive_sink = None
+        sink = load_sink
+        if archive is not None:
+            archive_sink = NTriplesSink(os.path.join(work_dir, "emitted.nt"))
+            sink = TeeSink(load_sink, archive_sink)
+
+        func_args["sink"] = sink
+        # Limit to actual arguments
+        remove_extra_args(func_args, func)
+        try:
+            g = func(**func_args)
+            if g is not None and g is not sink:
+                # The load function does not stream, so send the graph it built.
+                sink += g
+        finally:
+            # Even if the load function raises, wait for the splits in flight, so that the acknowledged splits are
+            # recorded and the runner's threads are stopped.
+            loaded = load_sink.close()
+            if archive_sink is not None:
+                archive_sink.close()
+
+        # G is none if an error occurred. Triples already sent remain in VIVO.
+        if g is None:
+            print "Not archiving %s due to an error." % local_args.graph
+            return False
+        if archive is not None:
+            if loaded:
+                sorted_file = sort_ntriples(NTriplesFile(archive_sink.filepath), os.path.join(work_dir, "graph.nt"))
+                archive.save_sorted(sorted_file, journal, full=True)
+                return True
+            not_archived(local_args)
+            return False
+        return loaded
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def load_data_type(data_type, func, source_files, local_args, func_args, loader_version, sparql_endpoint):
+    """
+    Generate, diff, load and archive the graph for a data type.
+
+    :param func: the load function for the data type
+    :param source_files: the data type's source files in the data directory
+    :param func_args: arguments for the load functions. Those that func does not take are ignored.
+    :param loader_version: the version of the loader code, from code_version()
+    :return: True if the graph was loaded and archived or was skipped since its inputs are unchanged
+    """
+    func_args = func_args.copy()
+    local_args.graph = data_type
+    if local_args.stream_load and local_args.perform_load:
+        return stream_load_graph(func, func_args, local_args, sparql_endpoint)
+    # Limit to actual arguments
+    remove_extra_args(func_args, func)
+    # Data types are skipped if their inputs are unchanged since they were last loaded and archived.
+    source_fingerprint = None
+    if local_args.perform_load and local_args.perform_serialize and local_args.perform_diff:
+        source_fingerprint = SourceFingerprint(local_args.graph_dir, data_type)
+        # The number of parse processes does not change the graph.
+        data_type_fingerprint = fingerprint([os.path.join(local_args.data_dir, filename)
+                                             for filename in source_files],
+                                            dict((key, value) for key, value in func_args.items()
+                                                 if key != "parse_processes"),
+                                            loader_version)
+        if not local_args.force and source_fingerprint.matches(data_type_fingerprint):
+            print "Skipping %s since its source files, gwids and the loader code are unchanged. " \
+                  "Use --force to load anyway." % data_type
+            return True
+        source_fingerprint.clear()
+    graph = func(**func_args)
+    if process_graph(graph, local_args, sparql_endpoint):
+        if source_fingerprint is not None:
+            source_fingerprint.record(data_type_fingerprint)
+        return True
+    return False
+
+
+# The state of a process loading a data type in parallel, set by init_worker().
+worker_context = {}
+
+
+def init_worker(local_args, func_args, loader_version, load_funcs, data_type_files, upload_slots):
+    worker_context.update(local_args=local_args, func_args=func_args, loader_version=loader_version,
+                          load_funcs=load_funcs, data_type_files=data_type_files)
+    # Each process has its own client, but all of the clients share the upload slots.
+    worker_context["sparql_endpoint"] = SparqlEndpoint(local_args.endpoint, local_args.username,
+                                                       local_args.password, pool_size=local_args.load_concurrency,
+                                                       slots=upload_slots)
+
+
+def worker_load_data_type(data_type):
+    """
+    :return: whether the data type was loaded and the cache counts for loading it, to be summed by the parent process
+    """
+    before_counts = cache_counts()
+    loaded = load_data_type(data_type, worker_context["load_funcs"][data_type],
+                            worker_context["data_type_files"][data_type], worker_context["local_args"],
+                            worker_context["func_args"], worker_context["loader_version"],
+                            worker_context["sparql_endpoint"])
+    return loaded, [count - before_count for (count, before_count) in zip(cache_counts(), before_counts)]
+
+
+def cache_counts():
+    """
+    Returns the hits and misses of the caches in this process.
+    """
+    return [column_cache.hits, column_cache.misses, identifier_cache.hits, identifier_cache.misses,
+            shared_entities.hits, shared_entities.misses]
+
+
+def print_cache_counts(counts):
+    (column_hits, column_misses, identifier_hits, identifier_misses, shared_hits, shared_misses) = counts
+    print "Column cache: %s hits, %s misses." % (column_hits, column_misses)
+    print "Identifier cache: %s hits, %s misses." % (identifier_hits, identifier_misses)
+    print "Shared entities: %s built, %s reused." % (shared_misses, shared_hits)
+
+
+def not_archived(local_args):
+    # Not archiving. The journal records the splits that succeeded, so the next run only sends the rest.
+    warning_log.error("Not archiving %s since some splits failed.", local_args.graph)
+    print "Not archiving %s since some splits failed." % local_args.graph
 
 
 if __name__ == '__main__':
@@ -72,6 +308,23 @@ if __name__ == '__main__':
                         help="Generate RDF, but do not load into VIVO.")
     parser.add_argument("--skip-diff", action="store_false", dest="perform_diff",
                         help="Load everything, not just the difference with last load.")
+    parser.add_argument("--stream-load", action="store_true",
+                        help="Load everything, sending triples to VIVO as they are generated rather than building "
+                             "graphs in memory. Implies --skip-diff.")
+    parser.add_argument("--stream-diff", action="store_true",
+                        help="Diff by merging sorted N-Triples files rather than in memory. Graphs are archived as "
+                             "sorted N-Triples.")
+    parser.add_argument("--archive-format", choices=("snapshot", "turtle"), default="turtle",
+                        help="Format for archived graphs. Default is turtle. snapshot is a compact binary format "
+                             "that is faster to read and write. Ignored with --stream-diff.")
+    default_base_interval = 10
+    parser.add_argument("--base-interval", type=int, default=default_base_interval,
+                        help="Number of runs archived as deltas before the full graph is archived again. "
+                             "Default is %s." % default_base_interval)
+    default_retain_bases = 2
+    parser.add_argument("--retain-bases", type=int, default=default_retain_bases,
+                        help="Number of full graphs, with their deltas, to keep in the archive. "
+                             "Default is %s." % default_retain_bases)
     parser.add_argument("--skip-serialize", action="store_false", dest="perform_serialize",
                         help="Don't save the load.")
     parser.add_argument("--skip-orcid2vivo", action="store_false", dest="perform_orcid2vivo",
@@ -84,6 +337,46 @@ if __name__ == '__main__':
     parser.add_argument("--delete-split-size", type=int, default=default_delete_split_size,
                         help="Maximum number of triples to include in a single delete. "
                              "Default is %s" % default_delete_split_size)
+    parser.add_argument("--split-bytes", type=int,
+                        help="Maximum size in bytes of the triples to include in a single load. Applies in addition "
+                             "to --split-size. To limit only by size, also set --split-size 0.")
+    parser.add_argument("--delete-split-bytes", type=int,
+                        help="Maximum size in bytes of the triples to include in a single delete. Applies in "
+                             "addition to --delete-split-size.")
+    parser.add_argument("--split-size-bounds", type=int, nargs=2, metavar=("MIN", "MAX"),
+                        help="Adjust the number of triples in a single load between MIN and MAX based on how long "
+                             "loads take, starting from --split-size.")
+    parser.add_argument("--delete-split-size-bounds", type=int, nargs=2, metavar=("MIN", "MAX"),
+                        help="Adjust the number of triples in a single delete between MIN and MAX based on how long "
+                             "deletes take, starting from --delete-split-size.")
+    default_target_latency = 60
+    parser.add_argument("--target-latency", type=int, default=default_target_latency,
+                        help="Seconds that a single load or delete should take when adjusting split sizes. "
+                             "Default is %s" % default_target_latency)
+    default_load_concurrency = 1
+    parser.add_argument("--load-concurrency", type=int, default=default_load_concurrency,
+                        help="Maximum number of SPARQL LOADs to perform at the same time. Default is %s" %
+                             default_load_concurrency)
+    default_processes = 1
+    parser.add_argument("--processes", type=int, default=default_processes,
+                        help="Number of data types to generate and diff at the same time, each in its own process. "
+                             "Data types are started once the data types they depend on have finished. SPARQL "
+                             "Updates by all of the processes are limited by --load-concurrency. Default is %s." %
+                             default_processes)
+    default_parse_processes = 1
+    parser.add_argument("--parse-processes", type=int, default=default_parse_processes,
+                        help="Number of processes to parse each FIS or MyGW data file with, each parsing a range of "
+                             "rows. Ignored with --processes. Default is %s." % default_parse_processes)
+    parser.add_argument("--load-mode", choices=("load", "insert"), default="load",
+                        help="Load by SPARQL LOAD of files served from --htdocs-dir or by streaming SPARQL "
+                             "INSERT DATA, which does not require a web server. Default is load.")
+    default_retries = 3
+    parser.add_argument("--retries", type=int, default=default_retries,
+                        help="Number of times to retry a failed load or delete. Default is %s" % default_retries)
+    default_retry_backoff = 5
+    parser.add_argument("--retry-backoff", type=int, default=default_retry_backoff,
+                        help="Seconds to wait before retrying a failed load or delete, doubling for each further "
+                             "retry. Default is %s" % default_retry_backoff)
     default_data_dir = "./data"
     parser.add_argument("--data-dir", default=default_data_dir, dest="data_dir",
                         help="Directory containing the data files. Default is %s" % default_data_dir)
@@ -114,13 +407,27 @@ if __name__ == '__main__':
     parser.add_argument("--skip-appt", action="store_false", dest="load_appt",
                         help="Skip loading the academic appointment for the faculty. For b_acadappt only.")
     parser.add_argument("--resume", action="store_true",
-                        help="Resume loading all starting with the provided data type.")
+                        help="Resume loading all starting with the provided data type. Within a data type, "
+                             "only splits that were not acknowledged are sent again.")
     default_orcid2vivo_days = 7
     parser.add_argument("--orcid2vivo-days", type=int, default=default_orcid2vivo_days,
                         help="Run orcid2vivo for orcid ids that have never been loaded or have not been loaded in this "
                              "many days. Default is %s days." % default_orcid2vivo_days)
     parser.add_argument("--mediaexpert", action="store_true", dest="is_mediaexpert",
                         help="Perform a media expert load.")
+    parser.add_argument("--skip-row-cache", action="store_false", dest="use_row_cache",
+                        help="Generate the triples for every row of the data files rather than reusing the triples "
+                             "for rows that are unchanged since the last load.")
+    parser.add_argument("--skip-column-cache", action="store_false", dest="use_column_cache",
+                        help="Parse the data files rather than reading them from the column files in the .columns "
+                             "directory of the data directory.")
+    default_identifier_cache_size = 100000
+    parser.add_argument("--identifier-cache-size", type=int, default=default_identifier_cache_size,
+                        help="Number of hash identifiers and URIs to cache, shared by all data types. "
+                             "Default is %s." % default_identifier_cache_size)
+    parser.add_argument("--force", action="store_true",
+                        help="Load data types even if their source files, gwids and the loader code are unchanged "
+                             "since the last load.")
 
     # Map of label for data type to load function.
     data_type_map = OrderedDict([
@@ -161,6 +468,84 @@ if __name__ == '__main__':
         ("mygw_users", mygw_load.load_users)
     ])
 
+    # Map of label for data type to the data types that must be loaded before it. People and organizations are loaded
+    # before the data types that relate to them, as in the recommended order. Otherwise, data types are independent,
+    # since each has its own graph.
+    data_type_dependencies = {
+        "b_emplappt": ["b_demographic", "b_organization"],
+        "fis_faculty": ["b_demographic", "fis_department"],
+        "fis_acadappt": ["fis_faculty"],
+        "fis_adminappt": ["fis_faculty"],
+        "fis_degree_ed": ["fis_faculty"],
+        "fis_non_degree_ed": ["fis_faculty"],
+        "fis_courses": ["fis_faculty"],
+        "fis_awards": ["fis_faculty"],
+        "fis_prof_memberships": ["fis_faculty"],
+        "fis_reviewers": ["fis_faculty"],
+        "fis_presentations": ["fis_faculty"],
+        "fis_books": ["fis_faculty"],
+        "fis_reports": ["fis_faculty"],
+        "fis_articles": ["fis_faculty"],
+        "fis_acad_articles": ["fis_faculty"],
+        "fis_article_abstracts": ["fis_faculty"],
+        "fis_reviews": ["fis_faculty"],
+        "fis_ref_articles": ["fis_faculty"],
+        "fis_letters": ["fis_faculty"],
+        "fis_testimony": ["fis_faculty"],
+        "fis_chapters": ["fis_faculty"],
+        "fis_conf_abstracts": ["fis_faculty"],
+        "fis_conf_papers": ["fis_faculty"],
+        "fis_conf_posters": ["fis_faculty"],
+        "fis_patents": ["fis_faculty"],
+        "fis_grants": ["fis_faculty"],
+        "mygw_awards": ["b_demographic"],
+        "mygw_prof_memberships": ["b_demographic"],
+        "mygw_reviewers": ["b_demographic"],
+        "mygw_presentations": ["b_demographic"],
+        "mygw_users": ["b_demographic"],
+        "mygw_mediaexperts": ["b_demographic"]
+    }
+
+    # Map of label for data type to the source files in the data directory, other than those for the gwids and
+    # netid lookup, which are covered by the load function's arguments.
+    data_type_files = {
+        "b_demographic": ["vivo_demographic.txt"],
+        "b_organization": ["vivo_emplappt.txt", "vivo_orgn.txt"],
+        "b_emplappt": ["vivo_emplappt.txt"],
+        "fis_department": ["fis_department.xml"],
+        "fis_faculty": ["fis_faculty.xml"],
+        "fis_acadappt": ["fis_academic_appointment.xml"],
+        "fis_adminappt": ["fis_admin_appointment.xml"],
+        "fis_degree_ed": ["fis_degree_education.xml"],
+        "fis_non_degree_ed": ["fis_non_degree_education.xml"],
+        "fis_courses": ["fis_courses.xml"],
+        "fis_awards": ["fis_awards.xml"],
+        "fis_prof_memberships": ["fis_prof_memberships.xml"],
+        "fis_reviewers": ["fis_reviewer.xml"],
+        "fis_presentations": ["fis_presentations.xml"],
+        "fis_books": ["fis_books.xml"],
+        "fis_reports": ["fis_reports.xml"],
+        "fis_articles": ["fis_articles.xml"],
+        "fis_acad_articles": ["fis_acad_articles.xml"],
+        "fis_article_abstracts": ["fis_article_abstracts.xml"],
+        "fis_reviews": ["fis_reviews.xml"],
+        "fis_ref_articles": ["fis_ref_articles.xml"],
+        "fis_letters": ["fis_letters.xml"],
+        "fis_testimony": ["fis_testimony.xml"],
+        "fis_chapters": ["fis_chapters.xml"],
+        "fis_conf_abstracts": ["fis_conf_abstracts.xml"],
+        "fis_conf_papers": ["fis_conf_papers.xml"],
+        "fis_conf_posters": ["fis_conf_posters.xml"],
+        "fis_patents": ["fis_patents.xml"],
+        "fis_grants": ["fis_grants.xml"],
+        "mygw_awards": ["mygw_award.xml"],
+        "mygw_prof_memberships": ["mygw_membership.xml"],
+        "mygw_reviewers": ["mygw_editorial.xml"],
+        "mygw_presentations": ["mygw_presentation.xml"],
+        "mygw_users": ["mygw_users.xml"],
+        "mygw_mediaexperts": ["mygw_mediaexperts.xml"]
+    }
+
     data_types = list(data_type_map.keys())
     data_types.append("all")
 
@@ -170,6 +555,10 @@ if __name__ == '__main__':
     # Parse
     args = parser.parse_args()
 
+    # Streaming loads everything
+    if args.stream_load:
+        args.perform_diff = False
+
     # If all selected or resuming
     if "all" in args.data_type or (args.resume and len(args.data_type) == 1):
         # Forcing skipping appt for b_acadappt
@@ -194,25 +583,39 @@ if __name__ == '__main__':
             if found_resume_data_type:
                 args.data_type.append(data_type)
 
+    # Split sizes adjusted based on how long loads and deletes take. These are shared by all data types.
+    if args.split_size_bounds:
+        args.split_size = AdaptiveSplitSize(args.split_size_bounds[0], args.split_size_bounds[1],
+                                            size=args.split_size, target_latency=args.target_latency)
+    if args.delete_split_size_bounds:
+        args.delete_split_size = AdaptiveSplitSize(args.delete_split_size_bounds[0], args.delete_split_size_bounds[1],
+                                                   size=args.delete_split_size, target_latency=args.target_latency)
+
     start_time = time.time()
 
+    # Data files are read through column files, so each is parsed once.
+    column_cache.enabled = args.use_column_cache
+
+    # Lookups from the data files, each of which is scanned once
+    data_context = DataContext(args.data_dir)
+
     # Load non_faculty_gwids and faculty_gwids
     if args.non_faculty:
-        non_faculty_gwids = args.non_faculty
+        non_faculty_gwids = GwidSet(args.non_faculty)
     else:
-        non_faculty_gwids = get_non_faculty_gwids(args.data_dir, args.non_fac_limit)
+        non_faculty_gwids = data_context.non_faculty_gwids(args.non_fac_limit)
     # For mediaexpert, this is further limited.
     if args.is_mediaexpert:
-        non_faculty_gwids = mediaexpert_intersection(non_faculty_gwids, args.data_dir)
+        non_faculty_gwids = data_context.mediaexpert_intersection(non_faculty_gwids)
     print "%s non-faculty" % len(non_faculty_gwids)
 
     if args.faculty:
-        faculty_gwids = args.faculty
+        faculty_gwids = GwidSet(args.faculty)
     else:
-        faculty_gwids = get_faculty_gwids(args.data_dir, args.fac_limit)
+        faculty_gwids = data_context.faculty_gwids(args.fac_limit)
     # For mediaexpert, this is further limited.
     if args.is_mediaexpert:
-        faculty_gwids = mediaexpert_intersection(faculty_gwids, args.data_dir)
+        faculty_gwids = data_context.mediaexpert_intersection(faculty_gwids)
     print "%s faculty" % len(faculty_gwids)
 
     # Setup directory for orcid2vivo
@@ -222,25 +625,52 @@ if __name__ == '__main__':
         os.mkdir(store_dir)
 
     # Load netid lookup
-    netid_lookup = get_netid_lookup(args.data_dir)
+    netid_lookup = data_context.netid_lookup()
 
     # Load skip name gwids
-    skip_name_gwids = get_skip_name_gwids(args.data_dir) if args.is_mediaexpert else []
-
-    # Load each data type
-    for data_type in args.data_type:
-        func_args = vars(args).copy()
-        func_args["non_faculty_gwids"] = non_faculty_gwids
-        func_args["faculty_gwids"] = faculty_gwids
-        func_args["store_dir"] = store_dir
-        func_args["netid_lookup"] = netid_lookup
-        func_args["skip_name_gwids"] = skip_name_gwids
-        args.graph = data_type
-        func = data_type_map[data_type]
-        # Limit to actual arguments
-        remove_extra_args(func_args, func)
-        graph = func(**func_args)
-        process_graph(graph, args)
+    skip_name_gwids = data_context.skip_name_gwids() if args.is_mediaexpert else []
+
+    # The data type files, load function arguments and graph processing in this script also determine the graphs.
+    loader_version = code_version([os.path.abspath(__file__)])
+    identifier_cache.max_size = args.identifier_cache_size
+
+    func_args = vars(args).copy()
+    func_args["non_faculty_gwids"] = non_faculty_gwids
+    func_args["faculty_gwids"] = faculty_gwids
+    func_args["store_dir"] = store_dir
+    func_args["netid_lookup"] = netid_lookup
+    func_args["skip_name_gwids"] = skip_name_gwids
+    func_args["row_cache_dir"] = os.path.join(args.graph_dir, "rows") if args.use_row_cache else None
+
+    if args.processes > 1:
+        # Load data types in parallel. SPARQL Updates by all of the processes share the upload slots.
+        upload_slots = multiprocessing.BoundedSemaphore(args.load_concurrency)
+        scheduler = DataTypeScheduler(data_type_dependencies, processes=args.processes, initializer=init_worker,
+                                      initargs=(args, func_args, loader_version, data_type_map, data_type_files,
+                                                upload_slots))
+        results = scheduler.run(args.data_type, worker_load_data_type)
+        failed_data_types = [data_type for data_type in args.data_type
+                             if results.get(data_type) is None or not results[data_type][0]]
+        if failed_data_types and args.perform_load and args.perform_serialize:
+            print "Not loaded and archived: %s" % ", ".join(failed_data_types)
+        # The counts of this process (e.g., reading the data files for the gwids) and of each data type
+        counts = cache_counts()
+        for result in results.values():
+            if result is not None:
+                counts = [count + worker_count for (count, worker_count) in zip(counts, result[1])]
+        print_cache_counts(counts)
+    else:
+        # Client for SPARQL Update shared by all data types
+        sparql_endpoint = SparqlEndpoint(args.endpoint, args.username, args.password,
+                                         pool_size=args.load_concurrency)
+
+        # Load each data type
+        for data_type in args.data_type:
+            load_data_type(data_type, data_type_map[data_type], data_type_files[data_type], args, func_args,
+                           loader_version, sparql_endpoint)
+
+        sparql_endpoint.close()
+        print_cache_counts(cache_counts())
 
     # Run orcid2vivo
     if args.perform_orcid2vivo:
@@ -0,0 +1,269 @@
+import json
+import time
+
+import os
+from loader.diff import sort_ntriples
+from loader.journal import TripleLog
+from loader.ntriples import NTriplesFile
+from loader.snapshot import write_snapshot, snapshot_triples
+from loader.sparql import serialize
+from loader.store import compact_graph
+
+# Extensions of archived graphs, in order of preference.
+_format_preference = {
+    ".snap": 2,
+    ".nt": 1,
+    ".ttl": 0
+}
+
+
+class GraphArchive:
+    """
+    The archived graphs for a data type, stored as full bases plus a delta for each run since the base.
+
+    A delta (<prefix>-<timestamp>.delta) is the journal of the triples that the run added and deleted.
+    The manifest (<prefix>.manifest) lists the bases and their deltas, oldest first, so that the latest
+    graph can be found without scanning the directory. A new base is written every base_interval runs and
+    only the most recent retain_bases bases, with their deltas, are kept.
+    """
+    def __init__(self, graph_dir, prefix, archive_format="turtle", base_interval=10, retain_bases=2):
+        """
+        :param graph_dir: the directory containing the graph files
+        :param prefix: prefix for the filenames, i.e., the data type
+        :param archive_format: format for bases, either turtle or snapshot
+        :param base_interval: number of deltas after which a new base is written
+        :param retain_bases: number of bases to keep
+        """
+        self.graph_dir = graph_dir
+        self.prefix = prefix
+        self.archive_format = archive_format
+        self.base_interval = base_interval
+        self.retain_bases = max(retain_bases, 1)
+        self.manifest_filepath = os.path.join(graph_dir, "%s.manifest" % prefix)
+
+    def load(self):
+        """
+        Returns the latest graph, i.e., the latest base with its deltas applied.
+
+        Without a manifest, the most recent archived graph is used.
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return load_previous_graph(self.graph_dir, self.prefix)
+        entry = manifest["history"][-1]
+        print "Loading existing graph %s for %s in %s" % (entry["base"], self.prefix, self.graph_dir)
+        g = _load_graph(os.path.join(self.graph_dir, entry["base"]), compact_graph())
+        for delta in self._deltas(entry):
+            delta.apply(g)
+        return g
+
+    def load_sorted(self, work_dir):
+        """
+        Returns the latest base as sorted N-Triples and the deltas to apply to it.
+
+        :param work_dir: directory in which to write a converted base
+        :return: NTriplesFile of the base or None and list of TripleLogs of the deltas
+        """
+        manifest = self._read_manifest()
+        if manifest is None:
+            return load_previous_sorted_graph(self.graph_dir, self.prefix, work_dir), []
+        entry = manifest["history"][-1]
+        return _sorted_graph(self.graph_dir, entry["base"], self.prefix, work_dir), self._deltas(entry)
+
+    def save(self, g, journal, full=False):
+        """
+        Archive the result of a run.
+
+        :param g: the new graph
+        :param journal: ChunkJournal of the triples that the run added and deleted
+        :param full: True if the journal is not a delta from the latest graph, e.g., the diff was skipped
+        """
+        manifest = self._read_manifest()
+        if self._needs_base(manifest, full):
+            filename = archive_graph(g, self.graph_dir, self.prefix, archive_format=self.archive_format)
+            self._add_base(manifest, filename)
+            journal.clear()
+        else:
+            self._add_delta(manifest, journal)
+
+    def save_sorted(self, sorted_file, journal, full=False):
+        """
+        Archive the result of a run in which the graph was sorted N-Triples.
+
+        :param sorted_file: NTriplesFile of the new graph, sorted by sort_ntriples
+        :param journal: ChunkJournal of the triples that the run added and deleted
+        :param full: True if the journal is not a delta from the latest graph, e.g., the diff was skipped
+        """
+        manifest = self._read_manifest()
+        if self._needs_base(manifest, full):
+            filename = archive_sorted_graph(sorted_file, self.graph_dir, self.prefix)
+            self._add_base(manifest, filename)
+            journal.clear()
+        else:
+            self._add_delta(manifest, journal)
+
+    def replace_base(self, filename, new_filename):
+        """
+        Replace references to a base, e.g., after it has been converted to another format.
+
+        :return: True if the base was referenced
+        """
+        manifest = self._read_manifest()
+        replaced = False
+        if manifest is not None:
+            for entry in manifest["history"]:
+                if entry["base"] == filename:
+                    entry["base"] = new_filename
+                    replaced = True
+            if replaced:
+                self._write_manifest(manifest)
+        return replaced
+
+    def _needs_base(self, manifest, full):
+        return full or manifest is None or len(manifest["history"][-1]["deltas"]) >= self.base_interval
+
+    def _add_base(self, manifest, filename):
+        if manifest is None:
+            manifest = {"history": []}
+        manifest["history"].append({"base": filename, "deltas": []})
+        pruned = manifest["history"][:-self.retain_bases]
+        manifest["history"] = manifest["history"][-self.retain_bases:]
+        # Write the manifest before removing files, so that it never references a removed file.
+        self._write_manifest(manifest)
+        for entry in pruned:
+            for pruned_filename in [entry["base"]] + entry["deltas"]:
+                pruned_filepath = os.path.join(self.graph_dir, pruned_filename)
+                if os.path.exists(pruned_filepath):
+                    print "Removing %s" % pruned_filename
+                    os.remove(pruned_filepath)
+
+    def _add_delta(self, manifest, journal):
+        if not journal.exists():
+            print "No changes to archive for %s" % self.prefix
+            return
+        filename = "%s-%s.delta" % (self.prefix, time.strftime("%Y%m%d%H%M%S"))
+        print "Archiving delta to %s" % filename
+        os.rename(journal.filepath, os.path.join(self.graph_dir, filename))
+        manifest["history"][-1]["deltas"].append(filename)
+        self._write_manifest(manifest)
+
+    def _deltas(self, entry):
+        return [TripleLog(os.path.join(self.graph_dir, filename)) for filename in entry["deltas"]]
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_filepath):
+            return None
+        with open(self.manifest_filepath) as manifest_file:
+            return json.load(manifest_file)
+
+    def _write_manifest(self, manifest):
+        tmp_filepath = os.path.join(self.graph_dir, ".%s.manifest" % self.prefix)
+        with open(tmp_filepath, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.rename(tmp_filepath, self.manifest_filepath)
+
+
+def archive_graph(g, graph_dir, prefix, archive_format="turtle"):
+    """
+    Save a graph to the graph archive directory.
+
+    The format for the filename is <prefix>-<timestamp>.ttl or, for a snapshot, <prefix>-<timestamp>.snap.
+
+    :param g: the graph to archive
+    :param graph_dir: the directory containing the graph files
+    :param prefix: prefix for the filename
+    :param archive_format: turtle or snapshot
+    :return: filename of the archived graph
+    """
+    if archive_format == "turtle":
+        return serialize(g, graph_dir, prefix)
+    filename = "%s-%s.snap" % (prefix, time.strftime("%Y%m%d%H%M%S"))
+    print "Archiving %s triples to %s" % (len(g), filename)
+    write_snapshot(g, os.path.join(graph_dir, filename))
+    return filename
+
+
+def load_previous_graph(graph_dir, prefix):
+    """
+    Find the most recent graph with the provided prefix.
+
+    :param graph_dir: the directory containing the graph files
+    :param prefix: prefix for the filename
+    :return: the most recent graph or an empty graph
+    """
+    filename = _previous_graph_filename(graph_dir, prefix)
+    g = compact_graph()
+    if filename:
+        print "Loading existing graph %s for %s in %s" % (filename, prefix, graph_dir)
+        _load_graph(os.path.join(graph_dir, filename), g)
+    return g
+
+
+def load_previous_sorted_graph(graph_dir, prefix, work_dir):
+    """
+    Find the most recent graph with the provided prefix as sorted N-Triples.
+
+    Graphs archived by archive_sorted_graph are already sorted. Other graphs are converted.
+
+    :param graph_dir: the directory containing the graph files
+    :param prefix: prefix for the filename
+    :param work_dir: directory in which to write a converted graph
+    :return: NTriplesFile of the most recent graph or None
+    """
+    filename = _previous_graph_filename(graph_dir, prefix)
+    if not filename:
+        return None
+    return _sorted_graph(graph_dir, filename, prefix, work_dir)
+
+
+def archive_sorted_graph(sorted_file, graph_dir, prefix):
+    """
+    Move a sorted N-Triples file into the graph archive directory.
+
+    The format for the filename is <prefix>-<timestamp>.nt.
+
+    :param sorted_file: NTriplesFile of the graph, sorted by sort_ntriples
+    :param graph_dir: the directory containing the graph files
+    :param prefix: prefix for the filename
+    :return: filename of the archived graph
+    """
+    filename = "%s-%s.nt" % (prefix, time.strftime("%Y%m%d%H%M%S"))
+    print "Archiving %s triples to %s" % (len(sorted_file), filename)
+    os.rename(sorted_file.filepath, os.path.join(graph_dir, filename))
+    return filename
+
+
+def _load_graph(filepath, g):
+    if filepath.endswith(".snap"):
+        g += snapshot_triples(filepath)
+    else:
+        g.parse(filepath, format="nt" if filepath.endswith(".nt") else "turtle")
+    return g
+
+
+def _previous_graph_filename(graph_dir, prefix):
+    #Find the most recent graph with the prefix
+    filenames = [f for f in os.listdir(graph_dir)
+                 if f.startswith(prefix + "-") and os.path.splitext(f)[1] in _format_preference]
+    if filenames:
+        # A converted graph has the same timestamp as the original, so prefer the faster format.
+        filenames.sort(key=lambda f: (os.path.splitext(f)[0], _format_preference[os.path.splitext(f)[1]]),
+                       reverse=True)
+        return filenames[0]
+    print "No existing graphs for %s in %s" % (prefix, graph_dir)
+    return None
+
+
+def _sorted_graph(graph_dir, filename, prefix, work_dir):
+    if filename.endswith(".nt"):
+        print "Using existing graph %s for %s in %s" % (filename, prefix, graph_dir)
+        return NTriplesFile(os.path.join(graph_dir, filename))
+    print "Converting existing graph %s for %s in %s to sorted N-Triples" % (filename, prefix, graph_dir)
+    filepath = os.path.join(graph_dir, filename)
+    if filename.endswith(".snap"):
+        return sort_ntriples(snapshot_triples(filepath), os.path.join(work_dir, "previous.nt"))
+    return sort_ntriples(_load_graph(filepath, compact_graph()),
+                         os.path.join(work_dir, "previous.nt"))
+
@@ -1,11 +1,12 @@
-from utility import join_if_not_empty, format_phone_number, to_hash_identifier, add_date_interval, add_season_date
+from utility import join_if_not_empty, format_phone_number, to_hash_uri, add_date_interval, add_season_date
 from rdflib import Literal, RDF, RDFS
+from entity import Entity
 from prefixes import *
 from namespace import *
 import re
 
 
-class Person:
+class Person(Entity):
     def __init__(self, netid, load_vcards=True):
         self.netid = netid
         self.uri = D[netid]
@@ -24,10 +25,7 @@ class Person:
         self.email = None
         self.phone = None
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Switched for testing sorting
         full_name = join_if_not_empty((self.first_name, self.middle_name, self.last_name))
         inverse_full_name = join_if_not_empty(
@@ -90,10 +88,8 @@ class Person:
                 g.add((vcard_address_uri, VCARD.postalCode, Literal(self.zip)))
                 g.add((vcard_address_uri, VCARD.country, Literal("USA")))
 
-        return g
-
 
-class NonFaculty:
+class NonFaculty(Entity):
     def __init__(self, person, person_type):
         self.person = person
         self.uri = self.person.uri
@@ -102,10 +98,7 @@ class NonFaculty:
         self.home_organization = None
         self.title = None
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Person type
         g.add((self.uri, RDF.type, getattr(VIVO, self.person_type)))
 
@@ -113,17 +106,15 @@ class NonFaculty:
         if self.title:
             # Remove level from librarian titles, e.g., Uv Librarian 4 FT
             clean_title = re.sub(r'(Lib(rarian)?) [0-4]', r'\1', self.title)
-            appt_uri = D[to_hash_identifier(PREFIX_APPOINTMENT, (self.uri, self.title))]
+            appt_uri = to_hash_uri(PREFIX_APPOINTMENT, (self.uri, self.title))
             g.add((appt_uri, RDF.type, VIVO.NonFacultyAcademicPosition))
             g.add((appt_uri, RDFS.label, Literal(clean_title)))
             # Related by
             g.add((self.uri, VIVO.relatedBy, appt_uri))
             g.add((self.home_organization.uri, VIVO.relatedBy, appt_uri))
 
-        return g
 
-
-class Faculty:
+class Faculty(Entity):
     def __init__(self, person, load_appt=True):
         self.person = person
         self.uri = self.person.uri
@@ -133,16 +124,13 @@ class Faculty:
         self.title = None
         self.start_term = None
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Person type
         g.add((self.uri, RDF.type, VIVO.FacultyMember))
 
         # Appointment
         if self.load_appt:
-            appt_uri = D[to_hash_identifier(PREFIX_APPOINTMENT, (self.uri,))]
+            appt_uri = to_hash_uri(PREFIX_APPOINTMENT, (self.uri,))
             g.add((appt_uri, RDF.type, VIVO.FacultyPosition))
             g.add((appt_uri, RDFS.label, Literal(self.title)))
             # Related by
@@ -155,23 +143,18 @@ class Faculty:
                               interval_start_uri if add_season_date(interval_start_uri, self.start_term, g) else None,
                               None)
 
-        return g
 
-
-class Organization:
+class Organization(Entity):
 
     def __init__(self, org_id, organization_type="Organization"):
         self.org_id = org_id
         self.organization_type = organization_type
-        self.uri = D[to_hash_identifier(PREFIX_ORGANIZATION, (self.org_id,))]
+        self.uri = to_hash_uri(PREFIX_ORGANIZATION, (self.org_id,))
 
         self.part_of = None
         self.name = None
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Department
         g.add((self.uri, RDF.type,
                FOAF.Organization if self.organization_type == "Organization"
@@ -183,23 +166,18 @@ class Organization:
         if self.part_of:
             g.add((self.uri, OBO.BFO_0000050, self.part_of.uri))
 
-        return g
-
 
-class Course:
+class Course(Entity):
     # "G10002741","625-25","LAW","200003","Fed Criminal Appellate Clinc","4","9",
     def __init__(self, person, course_number, course_subject, course_title):
         self.person = person
         self.course_number = course_number
         self.course_subject = course_subject
         self.course_title = course_title
-        self.uri = D[to_hash_identifier(PREFIX_TEACHER, (self.person.uri, self.course_number,
-                                                         self.course_subject))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_TEACHER, (self.person.uri, self.course_number,
+                                                self.course_subject))
 
+    def emit(self, g):
         # Teacher Role
         g.add((self.uri, RDF.type, VIVO.TeacherRole))
 
@@ -207,11 +185,9 @@ class Course:
         g.add((self.uri, OBO.RO_0000052, self.person.uri))
 
         # Realized in course
-        course_uri = D[to_hash_identifier(PREFIX_COURSE, (self.course_number, self.course_subject))]
+        course_uri = to_hash_uri(PREFIX_COURSE, (self.course_number, self.course_subject))
         g.add((course_uri, RDF.type, VIVO.Course))
         course_name = "%s (%s %s)" % (self.course_title,
                                       self.course_subject, self.course_number)
         g.add((course_uri, RDFS.label, Literal(course_name)))
         g.add((self.uri, OBO.BFO_0000054, course_uri))
-
-        return g
@@ -1,6 +1,7 @@
 from banner_entity import *
 from utility import *
-import unicodecsv as csv
+from store import compact_graph
+from gwids import gwid_set
 
 
 def print_position_code_to_name(data_dir):
@@ -8,88 +9,95 @@ def print_position_code_to_name(data_dir):
     Prints map of position code to position names.
     """
     positions = {}
-    with open(os.path.join(data_dir, "vivo_emplappt.txt"), 'rb') as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            pos_code = row["POSITION_CLASS"]
-            pos_name = row["JOB_TITLE"]
-            if not pos_code in positions:
-                positions[pos_code] = []
-            if not pos_name in positions[pos_code]:
-                positions[pos_code].append(pos_name)
+    reader = banner_result_generator(os.path.join(data_dir, "vivo_emplappt.txt"),
+                                     fields=("POSITION_CLASS", "JOB_TITLE"))
+    for row in reader:
+        pos_code = row["POSITION_CLASS"]
+        pos_name = row["JOB_TITLE"]
+        if not pos_code in positions:
+            positions[pos_code] = []
+        if not pos_name in positions[pos_code]:
+            positions[pos_code].append(pos_name)
     for pos_code in positions:
         print "%s --> %s" % (pos_code, positions[pos_code])
 
 
-def load_demographic(data_dir, non_faculty_gwids, faculty_gwids, netid_lookup, skip_name_gwids=None, limit=None):
+def load_demographic(data_dir, non_faculty_gwids, faculty_gwids, netid_lookup, skip_name_gwids=None, limit=None,
+                     sink=None):
     print """
     Loading demographic. Limit=%s.
     """ % limit
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
+    faculty_gwids = gwid_set(faculty_gwids)
+    skip_name_gwids = gwid_set(skip_name_gwids)
     # Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
-
-    with open(os.path.join(data_dir, "vivo_demographic.txt"), 'rb') as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        p_count = 0
-        row_count = 0
-        for row_count, row in enumerate(reader):
-            gw_id = row["EMPLOYEEID"]
-            if gw_id in faculty_gwids or gw_id in non_faculty_gwids:
-                p = Person(netid_lookup[gw_id])
-                if skip_name_gwids is None or gw_id not in skip_name_gwids:
-                    p.first_name = row["FIRST_NAME"] if row["FIRST_NAME"] else None
-                    p.middle_name = row["MIDDLE_NAME"] if row["MIDDLE_NAME"] else None
-                    p.last_name = row["LAST_NAME"] if row["LAST_NAME"] else None
-                p.address1 = row["ADDRESS_LINE1"] if row["ADDRESS_LINE1"] else None
-                p.address2 = row["ADDRESS_LINE2"] if row["ADDRESS_LINE2"] else None
-                p.address3 = row["ADDRESS_LINE3"] if row["ADDRESS_LINE3"] else None
-                p.city = row["CITY"] if row["CITY"] else None
-                p.state = row["STATE"] if row["STATE"] else None
-                p.zip = row["ZIP"] if row["ZIP"] else None
-                p.email = row["EMAIL"] if row["EMAIL"] else None
-                p.phone = row["PHONE"] if row["PHONE"] else None
-
-                g += p.to_graph()
-
-                p_count += 1
-                if limit and p_count >= limit:
-                    break
-
-        if not row_count:
-            warning_log.error("vivo_demographic.txt has no data.")
-            return None
+    g = sink if sink is not None else compact_graph()
+
+    reader = banner_result_generator(os.path.join(data_dir, "vivo_demographic.txt"),
+                                     fields=("EMPLOYEEID", "FIRST_NAME", "MIDDLE_NAME", "LAST_NAME", "ADDRESS_LINE1",
+                                             "ADDRESS_LINE2", "ADDRESS_LINE3", "CITY", "STATE", "ZIP", "EMAIL",
+                                             "PHONE"))
+    p_count = 0
+    row_count = 0
+    for row_count, row in enumerate(reader):
+        gw_id = row["EMPLOYEEID"]
+        if gw_id in faculty_gwids or gw_id in non_faculty_gwids:
+            p = Person(netid_lookup[gw_id])
+            if skip_name_gwids is None or gw_id not in skip_name_gwids:
+                p.first_name = row["FIRST_NAME"] if row["FIRST_NAME"] else None
+                p.middle_name = row["MIDDLE_NAME"] if row["MIDDLE_NAME"] else None
+                p.last_name = row["LAST_NAME"] if row["LAST_NAME"] else None
+            p.address1 = row["ADDRESS_LINE1"] if row["ADDRESS_LINE1"] else None
+            p.address2 = row["ADDRESS_LINE2"] if row["ADDRESS_LINE2"] else None
+            p.address3 = row["ADDRESS_LINE3"] if row["ADDRESS_LINE3"] else None
+            p.city = row["CITY"] if row["CITY"] else None
+            p.state = row["STATE"] if row["STATE"] else None
+            p.zip = row["ZIP"] if row["ZIP"] else None
+            p.email = row["EMAIL"] if row["EMAIL"] else None
+            p.phone = row["PHONE"] if row["PHONE"] else None
+
+            p.emit(g)
+
+            p_count += 1
+            if limit and p_count >= limit:
+                break
+
+    if not row_count:
+        warning_log.error("vivo_demographic.txt has no data.")
+        return None
 
     return g
 
 
-def load_emplappt(data_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_emplappt(data_dir, non_faculty_gwids, netid_lookup, limit=None, sink=None):
     #"G17437285","Uv Rsh Assoc Ft","28501","152401"
     print """
     Loading emplappt. Limit=%s.
     """ % limit
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
     #Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
     try:
-        with open(os.path.join(data_dir, "vivo_emplappt.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            p_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                gw_id = row["EMPLOYEEID"]
-                pos_cd = row["POSITION_CLASS"]
-                if gw_id in non_faculty_gwids:
-                    nf = NonFaculty(Person(netid_lookup[gw_id]), pos_code_to_classes.get(pos_cd, "NonFacultyAcademic"))
-                    nf.title = row["JOB_TITLE"]
-                    nf.home_organization = Organization(row["HOME_ORG_CODE"])
-                    g += nf.to_graph()
-
-                    p_count += 1
-                    if limit and p_count >= limit:
-                        break
-
-            if not row_count:
-                warning_log.error("vivo_emplappt.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_emplappt.txt"),
+                                         fields=("EMPLOYEEID", "POSITION_CLASS", "JOB_TITLE", "HOME_ORG_CODE"))
+        row_count = 0
+        p_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            gw_id = row["EMPLOYEEID"]
+            pos_cd = row["POSITION_CLASS"]
+            if gw_id in non_faculty_gwids:
+                nf = NonFaculty(Person(netid_lookup[gw_id]), pos_code_to_classes.get(pos_cd, "NonFacultyAcademic"))
+                nf.title = row["JOB_TITLE"]
+                nf.home_organization = Organization(row["HOME_ORG_CODE"])
+                nf.emit(g)
+
+                p_count += 1
+                if limit and p_count >= limit:
+                    break
+
+        if not row_count:
+            warning_log.error("vivo_emplappt.txt has no data.")
+            return None
 
         return g
         #If there is an IOError, log it and return None
@@ -98,44 +106,44 @@ def load_emplappt(data_dir, non_faculty_gwids, netid_lookup, limit=None):
         return None
 
 
-def load_orgn(data_dir, non_faculty_gwids, limit=None):
+def load_orgn(data_dir, non_faculty_gwids, limit=None, sink=None):
     #"001101","BOARD OF TRUSTEES"
     print """
     Loading orgn. Limit=%s.
     """ % limit
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
     #Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
 
     try:
         #Only load organizations that have entries in emplappt
         org_cds = set()
-        with open(os.path.join(data_dir, "vivo_emplappt.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                if row["EMPLOYEEID"] in non_faculty_gwids:
-                    org_cds.add(row["HOME_ORG_CODE"])
-            if not row_count:
-                warning_log.error("vivo_emplappt.txt has no data, so not loading organization.")
-                return None
-
-        with open(os.path.join(data_dir, "vivo_orgn.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            o_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                org_cd = row["ORG_CODE"]
-                if org_cd in org_cds:
-                    o = Organization(org_cd, organization_type="Department")
-                    o.name = row["ORG_TITLE"]
-                    g += o.to_graph()
-
-                    o_count += 1
-                    if limit and o_count >= limit:
-                        break
-            if not row_count:
-                warning_log.error("vivo_orgn.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_emplappt.txt"),
+                                         fields=("EMPLOYEEID", "HOME_ORG_CODE"))
+        row_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            if row["EMPLOYEEID"] in non_faculty_gwids:
+                org_cds.add(row["HOME_ORG_CODE"])
+        if not row_count:
+            warning_log.error("vivo_emplappt.txt has no data, so not loading organization.")
+            return None
+
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_orgn.txt"), fields=("ORG_CODE", "ORG_TITLE"))
+        row_count = 0
+        o_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            org_cd = row["ORG_CODE"]
+            if org_cd in org_cds:
+                o = Organization(org_cd, organization_type="Department")
+                o.name = row["ORG_TITLE"]
+                o.emit(g)
+
+                o_count += 1
+                if limit and o_count >= limit:
+                    break
+        if not row_count:
+            warning_log.error("vivo_orgn.txt has no data.")
+            return None
 
         return g
     #If there is an IOError, log it and return None
@@ -144,7 +152,7 @@ def load_orgn(data_dir, non_faculty_gwids, limit=None):
         return None
 
 
-def load_college(data_dir, limit=None):
+def load_college(data_dir, limit=None, sink=None):
     print """
     Loading college. Limit=%s.
     """ % limit
@@ -152,38 +160,36 @@ def load_college(data_dir, limit=None):
     try:
         college_cds = set()
         #Only load colleges that have entries in acadappt
-        with open(os.path.join(data_dir, "vivo_acadappt.txt"), 'rb') as csv_file:
-            row_count = 0
-            reader = csv.DictReader(csv_file, dialect="banner")
-            for row_count, row in enumerate(reader, start=1):
-                college_cds.add(row["COLLEGE"])
-            if not row_count:
-                warning_log.error("vivo_acadappt.txt has no data, so not loading college.")
-                return None
+        row_count = 0
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_acadappt.txt"), fields=("COLLEGE",))
+        for row_count, row in enumerate(reader, start=1):
+            college_cds.add(row["COLLEGE"])
+        if not row_count:
+            warning_log.error("vivo_acadappt.txt has no data, so not loading college.")
+            return None
 
         #Remove "No College Designated"
         college_cds.remove("00")
 
         #Create an RDFLib Graph
-        g = Graph(namespace_manager=ns_manager)
+        g = sink if sink is not None else compact_graph()
 
         #"01","Columbian Col & Grad School"
-        with open(os.path.join(data_dir, "vivo_college.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            o_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                college_cd = row["COLLEGE_CD"]
-                if college_cd in college_cds:
-                    o = Organization(college_cd, organization_type="College")
-                    o.name = row["COLLEGE"]
-                    g += o.to_graph()
-                    o_count += 1
-                    if limit and o_count >= limit:
-                        break
-            if not row_count:
-                warning_log.error("vivo_college.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_college.txt"), fields=("COLLEGE_CD", "COLLEGE"))
+        row_count = 0
+        o_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            college_cd = row["COLLEGE_CD"]
+            if college_cd in college_cds:
+                o = Organization(college_cd, organization_type="College")
+                o.name = row["COLLEGE"]
+                o.emit(g)
+                o_count += 1
+                if limit and o_count >= limit:
+                    break
+        if not row_count:
+            warning_log.error("vivo_college.txt has no data.")
+            return None
 
         return g
     #If there is an IOError, log it and return None
@@ -192,45 +198,44 @@ def load_college(data_dir, limit=None):
         return None
 
 
-def load_depart(data_dir, limit=None):
+def load_depart(data_dir, limit=None, sink=None):
     print """
     Loading department. Limit=%s.
     """ % limit
 
     #Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
 
     try:
         #Read acadappt to get map of department to college
         department_to_college_dict = {}
-        with open(os.path.join(data_dir, "vivo_acadappt.txt"), 'rb') as csv_file:
-            row_count = 0
-            reader = csv.DictReader(csv_file, dialect="banner")
-            for row_count, row in enumerate(reader, start=1):
-                department_to_college_dict[row["DEPARTMENT"]] = row["COLLEGE"]
+        row_count = 0
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_acadappt.txt"), fields=("DEPARTMENT", "COLLEGE"))
+        for row_count, row in enumerate(reader, start=1):
+            department_to_college_dict[row["DEPARTMENT"]] = row["COLLEGE"]
 
-            if not row_count:
-                warning_log.error("vivo_acadappt.txt has no data, so not loading department.")
-                return None
+        if not row_count:
+            warning_log.error("vivo_acadappt.txt has no data, so not loading department.")
+            return None
 
         #"HKLS","Human Kinetics&Leisure Studies"
-        with open(os.path.join(data_dir, "vivo_depart.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            o_count = 0
-            row_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                dept_cd = row["DEPARTMENT_CD"]
-                if dept_cd not in ("0000",):
-                    o = Organization(dept_cd, organization_type="Department")
-                    o.name = row["DEPARTMENT"]
-                    o.part_of = Organization(department_to_college_dict.get(dept_cd))
-                    g += o.to_graph()
-                    o_count += 1
-                    if limit and o_count >= limit:
-                        break
-            if not row_count:
-                warning_log.error("vivo_depart.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_depart.txt"),
+                                         fields=("DEPARTMENT_CD", "DEPARTMENT"))
+        o_count = 0
+        row_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            dept_cd = row["DEPARTMENT_CD"]
+            if dept_cd not in ("0000",):
+                o = Organization(dept_cd, organization_type="Department")
+                o.name = row["DEPARTMENT"]
+                o.part_of = Organization(department_to_college_dict.get(dept_cd))
+                o.emit(g)
+                o_count += 1
+                if limit and o_count >= limit:
+                    break
+        if not row_count:
+            warning_log.error("vivo_depart.txt has no data.")
+            return None
 
         return g
     #If there is an IOError, log it and return None
@@ -239,33 +244,34 @@ def load_depart(data_dir, limit=None):
         return None
 
 
-def load_acadappt(data_dir, faculty_gwids, netid_lookup, limit=None, load_appt=True):
+def load_acadappt(data_dir, faculty_gwids, netid_lookup, limit=None, load_appt=True, sink=None):
     print """
     Loading acadappt. Limit=%s. Load appt=%s.
     """ % (limit, load_appt)
+    faculty_gwids = gwid_set(faculty_gwids)
 
     #"G10002741","625-25","LAW","200003","Fed Criminal Appellate Clinc","4","9",
     #Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
 
     try:
-        with open(os.path.join(data_dir, "vivo_acadappt.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            for row_count, row in enumerate(reader):
-                gw_id = row["EMPLOYEEID"]
-                if gw_id in faculty_gwids:
-                    f = Faculty(Person(netid_lookup[gw_id]), load_appt=load_appt)
-                    f.department = Organization(row["DEPARTMENT"])
-                    f.title = row["POSITION_TITLE"]
-                    f.start_term = row["START_TERM_CODE"]
-                    g += f.to_graph()
-
-                    if limit and row_count > limit-1:
-                        break
-            if not row_count:
-                warning_log.error("vivo_acadappt.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_acadappt.txt"),
+                                         fields=("EMPLOYEEID", "DEPARTMENT", "POSITION_TITLE", "START_TERM_CODE"))
+        row_count = 0
+        for row_count, row in enumerate(reader):
+            gw_id = row["EMPLOYEEID"]
+            if gw_id in faculty_gwids:
+                f = Faculty(Person(netid_lookup[gw_id]), load_appt=load_appt)
+                f.department = Organization(row["DEPARTMENT"])
+                f.title = row["POSITION_TITLE"]
+                f.start_term = row["START_TERM_CODE"]
+                f.emit(g)
+
+                if limit and row_count > limit-1:
+                    break
+        if not row_count:
+            warning_log.error("vivo_acadappt.txt has no data.")
+            return None
 
         return g
     #If there is an IOError, log it and return None
@@ -274,31 +280,33 @@ def load_acadappt(data_dir, faculty_gwids, netid_lookup, limit=None, load_appt=T
         return None
 
 
-def load_courses(data_dir, non_faculty_gwids, faculty_gwids, netid_lookup, limit=None):
+def load_courses(data_dir, non_faculty_gwids, faculty_gwids, netid_lookup, limit=None, sink=None):
     print """
     Loading courses. Limit=%s.
     """ % limit
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
+    faculty_gwids = gwid_set(faculty_gwids)
     #"G10002741","625-25","LAW","200003","Fed Criminal Appellate Clinc","4","9",
 
     #Create an RDFLib Graph
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
 
     try:
         #This file is supposed to be utf-8, but is not valid.
-        with open(os.path.join(data_dir, "vivo_courses.txt"), 'rb') as csv_file:
-            reader = csv.DictReader(csv_file, dialect="banner")
-            row_count = 0
-            for row_count, row in enumerate(reader, start=1):
-                gw_id = row["EMPLOYEEID"]
-                if gw_id in faculty_gwids or gw_id in non_faculty_gwids:
-                    c = Course(Person(netid_lookup[gw_id]), row["COURSE_NBR"], row["SUBJECT"], row["COURSE_TITLE"])
-                    g += c.to_graph()
-
-                    if limit and row_count > limit-1:
-                        break
-            if not row_count:
-                warning_log.error("vivo_courses.txt has no data.")
-                return None
+        reader = banner_result_generator(os.path.join(data_dir, "vivo_courses.txt"),
+                                         fields=("EMPLOYEEID", "COURSE_NBR", "SUBJECT", "COURSE_TITLE"))
+        row_count = 0
+        for row_count, row in enumerate(reader, start=1):
+            gw_id = row["EMPLOYEEID"]
+            if gw_id in faculty_gwids or gw_id in non_faculty_gwids:
+                c = Course(Person(netid_lookup[gw_id]), row["COURSE_NBR"], row["SUBJECT"], row["COURSE_TITLE"])
+                c.emit(g)
+
+                if limit and row_count > limit-1:
+                    break
+        if not row_count:
+            warning_log.error("vivo_courses.txt has no data.")
+            return None
 
         return g
     #If there is an IOError, log it and return None
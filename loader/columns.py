@@ -0,0 +1,258 @@
+"""
+A parse-once cache of the source files as columns.
+
+The first time a source file (xml produced by mysql --xml or a Banner export) is read, it is parsed and its rows are
+written to a column file in the .columns directory next to it. Later reads, whether by the same run, a later run or
+the reports, read the column file rather than parsing the source file again and read only the columns they need.
+
+The rows are stored in blocks. Within a block, each column is stored separately, so a read seeks past the columns it
+does not need. Blocks are written as the rows are parsed and read one at a time, so memory use does not depend on the
+size of the source file. Values are stored with marshal, so they are read back with the same types (str, unicode or
+None) that parsing produces.
+
+A column file is used if the size and modification time of the source file match those it was written for or, if only
+the modification time differs (e.g., the export was copied again), the sha1 of the source file matches. In that case,
+the modification time in the column file is updated, so the source file is not hashed again.
+"""
+import hashlib
+import marshal
+import struct
+
+import os
+
+_version = 2
+# Number of rows in a block
+_block_rows = 4096
+_header_length = struct.Struct("<Q")
+_hash_block_size = 1048576
+
+
+class ColumnCache:
+    """
+    Reads source files as rows through column files.
+    """
+    def __init__(self, enabled=True):
+        """
+        :param enabled: if False, source files are always parsed
+        """
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def rows(self, filepath, parse, fields=None):
+        """
+        Returns a generator of the rows of a source file, starting with the field names.
+
+        :param filepath: the source file
+        :param parse: module-level function that takes a file path and returns an iterable of the rows of the file,
+        starting with the field names. Its name is part of the key of the column file.
+        :param fields: the field names to read or None for all. Field names that are not in the file are ignored.
+        """
+        # Opening the source file raises an IOError for a missing file, as reading it directly would.
+        with open(filepath, "rb") as source_file:
+            stat = os.fstat(source_file.fileno())
+        if not self.enabled:
+            return project(parse(filepath), fields)
+
+        column_filepath = os.path.join(os.path.dirname(filepath), ".columns",
+                                       "%s.%s.columns" % (os.path.basename(filepath), parse.__name__))
+        column_file = ColumnFile.open(column_filepath, stat, filepath)
+        if column_file is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            column_file = ColumnFile.build(column_filepath, stat, filepath, parse)
+            # The column file cannot be written (e.g., the directory is read-only).
+            if column_file is None:
+                return project(parse(filepath), fields)
+        return column_file.rows(fields)
+
+
+class ColumnFile:
+    """
+    The columns of a source file.
+
+    A column file contains the blocks, followed by a header and the length of the header. The header has the field
+    names, the row count, the key of the source file and, for each block, its row count and the (offset, length) of
+    each of its columns.
+    """
+    def __init__(self, filepath, header, header_offset):
+        """
+        :param filepath: the column file
+        :param header: the header
+        :param header_offset: the offset of the header in the column file
+        """
+        self.filepath = filepath
+        self.header = header
+        self.header_offset = header_offset
+
+    @staticmethod
+    def open(column_filepath, stat, filepath):
+        """
+        Returns the ColumnFile for a column file or None if it does not exist or does not match the source file.
+        """
+        try:
+            with open(column_filepath, "rb") as column_file:
+                column_file.seek(-_header_length.size, os.SEEK_END)
+                (header_length,) = _header_length.unpack(column_file.read(_header_length.size))
+                header_offset = column_file.tell() - _header_length.size - header_length
+                column_file.seek(header_offset)
+                header = marshal.loads(column_file.read(header_length))
+        except (IOError, EOFError, ValueError, TypeError, struct.error):
+            return None
+        if not isinstance(header, dict) or header.get("version") != _version or header["size"] != stat.st_size:
+            return None
+        column_file = ColumnFile(column_filepath, header, header_offset)
+        if header["mtime"] != stat.st_mtime:
+            if header["sha1"] != _file_sha1(filepath):
+                return None
+            column_file._update_mtime(stat.st_mtime)
+        return column_file
+
+    @staticmethod
+    def build(column_filepath, stat, filepath, parse):
+        """
+        Parses a source file and writes the column file.
+
+        :return: the ColumnFile or None if the column file cannot be written
+        """
+        dirname = os.path.dirname(column_filepath)
+        # Written to a temporary file and renamed, so that processes reading the same source file do not see a partial
+        # column file.
+        tmp_filepath = os.path.join(dirname, ".%s.%s" % (os.path.basename(column_filepath), os.getpid()))
+        try:
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            column_file = open(tmp_filepath, "wb")
+        except (IOError, OSError):
+            return None
+
+        try:
+            header, header_offset = _write_column_file(column_file, stat, filepath, parse)
+        except BaseException:
+            column_file.close()
+            os.remove(tmp_filepath)
+            raise
+        column_file.close()
+        os.rename(tmp_filepath, column_filepath)
+        return ColumnFile(column_filepath, header, header_offset)
+
+    def rows(self, fields=None):
+        """
+        Returns a generator of the rows, starting with the field names.
+
+        :param fields: the field names to read or None for all
+        """
+        all_fields = self.header["fields"]
+        field_indexes = range(len(all_fields)) if fields is None \
+            else [all_fields.index(field) for field in fields if field in all_fields]
+        yield [all_fields[i] for i in field_indexes]
+        with open(self.filepath, "rb") as column_file:
+            for (block_row_count, columns) in self.header["blocks"]:
+                if not field_indexes:
+                    for _ in xrange(block_row_count):
+                        yield ()
+                    continue
+                values = []
+                for i in field_indexes:
+                    (offset, length) = columns[i]
+                    column_file.seek(offset)
+                    values.append(marshal.loads(column_file.read(length)))
+                for row in zip(*values):
+                    yield row
+
+    def _update_mtime(self, mtime):
+        self.header["mtime"] = mtime
+        header_blob = marshal.dumps(self.header)
+        try:
+            with open(self.filepath, "r+b") as column_file:
+                column_file.seek(self.header_offset)
+                column_file.write(header_blob)
+                column_file.write(_header_length.pack(len(header_blob)))
+                column_file.truncate()
+        except IOError:
+            pass
+
+
+def _write_column_file(column_file, stat, filepath, parse):
+    """
+    Writes the blocks of rows of a source file and the header to a column file.
+
+    :return: the header and its offset
+    """
+    rows = iter(parse(filepath))
+    fields = list(next(rows, []))
+    blocks = []
+    row_count = 0
+    block = []
+    for row in rows:
+        # Like a csv.DictReader, short rows are padded with None and extra values are ignored.
+        if len(row) != len(fields):
+            row = list(row[:len(fields)]) + [None] * (len(fields) - len(row))
+        block.append(row)
+        if len(block) == _block_rows:
+            blocks.append(_write_block(column_file, block, len(fields)))
+            row_count += len(block)
+            block = []
+    if block:
+        blocks.append(_write_block(column_file, block, len(fields)))
+        row_count += len(block)
+    header = {
+        "version": _version,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha1": _file_sha1(filepath),
+        "fields": fields,
+        "row_count": row_count,
+        "blocks": blocks
+    }
+    header_offset = column_file.tell()
+    header_blob = marshal.dumps(header)
+    column_file.write(header_blob)
+    column_file.write(_header_length.pack(len(header_blob)))
+    return header, header_offset
+
+
+def _write_block(column_file, block, field_count):
+    """
+    Writes the columns of a block of rows.
+
+    :return: the row count of the block and the (offset, length) of each column
+    """
+    columns = []
+    for i in xrange(field_count):
+        blob = marshal.dumps([row[i] for row in block])
+        columns.append((column_file.tell(), len(blob)))
+        column_file.write(blob)
+    return len(block), columns
+
+
+def project(rows, fields=None):
+    """
+    Returns a generator of rows, starting with the field names, limited to some fields.
+
+    :param rows: iterable of rows, starting with the field names
+    :param fields: the field names to keep or None for all. Field names that are not in the rows are ignored.
+    """
+    rows = iter(rows)
+    all_fields = list(next(rows, []))
+    if fields is None:
+        yield all_fields
+        for row in rows:
+            yield row
+        return
+    field_indexes = [all_fields.index(field) for field in fields if field in all_fields]
+    yield [all_fields[i] for i in field_indexes]
+    for row in rows:
+        yield tuple(row[i] if i < len(row) else None for i in field_indexes)
+
+
+def _file_sha1(filepath):
+    sha1 = hashlib.sha1()
+    with open(filepath, "rb") as source_file:
+        for block in iter(lambda: source_file.read(_hash_block_size), ""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+column_cache = ColumnCache()
@@ -0,0 +1,156 @@
+import heapq
+import tempfile
+
+import os
+from loader.journal import net_line_sets
+from loader.namespace import ns_manager
+from loader.ntriples import triple_to_nt, NTriplesFile
+from rdflib import Graph, BNode
+from rdflib.compare import graph_diff as canonical_graph_diff
+
+
+def graph_diff(prev_g, g):
+    """
+    Find the triples to delete from and add to the previous graph to produce the graph.
+
+    The graphs produced by the loaders contain only URIRefs and Literals, so the diff is a set
+    difference of the triples. Only if either graph contains blank nodes are the graphs
+    canonicalized, which is much more expensive.
+
+    :param prev_g: the previous graph
+    :param g: the new graph
+    :return: set of triples to delete and set of triples to add
+    """
+    prev_triples = _triple_set(prev_g)
+    triples = _triple_set(g) if prev_triples is not None else None
+    if triples is None:
+        print "Graphs contain blank nodes, so canonicalizing for diff."
+        (g_both, g_del, g_add) = canonical_graph_diff(prev_g, g)
+        return set(g_del), set(g_add)
+    return prev_triples - triples, triples - prev_triples
+
+
+def stream_graph_diff(prev_file, new_file, work_dir, logs=None):
+    """
+    Find the triples to delete and to add by merging sorted N-Triples files.
+
+    Only a line from each file is held in memory at a time.
+
+    :param prev_file: NTriplesFile of the previous graph, sorted by sort_ntriples, or None
+    :param new_file: NTriplesFile of the new graph, sorted by sort_ntriples
+    :param work_dir: directory in which to write the diff
+    :param logs: TripleLogs, e.g., archived deltas and a ChunkJournal, to apply in order to the previous graph
+    :return: NTriplesFile of triples to delete and NTriplesFile of triples to add
+    """
+    prev_lines = prev_file.raw_lines() if prev_file is not None else iter(())
+    if logs:
+        (log_added, log_deleted) = net_line_sets(logs)
+        if log_added or log_deleted:
+            prev_lines = _unique(heapq.merge((line for line in prev_lines if line not in log_deleted),
+                                             sorted(log_added)))
+
+    del_file = NTriplesFile(os.path.join(work_dir, "delete.nt"), 0)
+    add_file = NTriplesFile(os.path.join(work_dir, "add.nt"), 0)
+    new_lines = new_file.raw_lines()
+    with open(del_file.filepath, "wb") as del_out, open(add_file.filepath, "wb") as add_out:
+        prev_line = next(prev_lines, None)
+        new_line = next(new_lines, None)
+        while prev_line is not None or new_line is not None:
+            if new_line is None or (prev_line is not None and prev_line < new_line):
+                del_out.write(prev_line)
+                del_file.count += 1
+                prev_line = next(prev_lines, None)
+            elif prev_line is None or new_line < prev_line:
+                add_out.write(new_line)
+                add_file.count += 1
+                new_line = next(new_lines, None)
+            else:
+                prev_line = next(prev_lines, None)
+                new_line = next(new_lines, None)
+    return del_file, add_file
+
+
+def sort_ntriples(triples, filepath, run_size=250000):
+    """
+    Write triples to a file as sorted, de-duplicated N-Triples.
+
+    This is an external merge sort, so at most run_size lines are held in memory at a time.
+
+    :param triples: the triples or N-Triples lines to sort
+    :param filepath: the file to write
+    :param run_size: maximum number of lines to sort in memory
+    :return: NTriplesFile of the sorted triples
+    """
+    work_dir = os.path.dirname(filepath)
+    run_filepaths = []
+    lines = []
+    for tr in triples:
+        lines.append(triple_to_nt(tr).encode("utf-8"))
+        if len(lines) >= run_size:
+            run_filepaths.append(_write_run(lines, work_dir))
+            lines = []
+    if not run_filepaths:
+        lines.sort()
+        return NTriplesFile(filepath, _write_lines(_unique(lines), filepath))
+
+    if lines:
+        run_filepaths.append(_write_run(lines, work_dir))
+    del lines
+    run_files = [open(run_filepath, "rb") for run_filepath in run_filepaths]
+    try:
+        count = _write_lines(_unique(heapq.merge(*run_files)), filepath)
+    finally:
+        for run_file in run_files:
+            run_file.close()
+        for run_filepath in run_filepaths:
+            os.remove(run_filepath)
+    return NTriplesFile(filepath, count)
+
+
+def triples_to_graph(triples):
+    """
+    Returns a graph containing the triples.
+    """
+    g = Graph(namespace_manager=ns_manager)
+    g += triples
+    return g
+
+
+def _triple_set(g):
+    """
+    Returns the set of triples in a graph or None if the graph contains a blank node.
+    """
+    triples = set()
+    for tr in g:
+        if isinstance(tr[0], BNode) or isinstance(tr[2], BNode):
+            return None
+        triples.add(tr)
+    return triples
+
+
+def _write_run(lines, work_dir):
+    lines.sort()
+    (fd, run_filepath) = tempfile.mkstemp(dir=work_dir, suffix=".nt")
+    with os.fdopen(fd, "wb") as run_file:
+        run_file.writelines(lines)
+    return run_filepath
+
+
+def _write_lines(lines, filepath):
+    count = 0
+    with open(filepath, "wb") as out:
+        for line in lines:
+            out.write(line)
+            count += 1
+    return count
+
+
+def _unique(sorted_lines):
+    """
+    Generator that skips repeated lines in sorted lines.
+    """
+    prev_line = None
+    for line in sorted_lines:
+        if line != prev_line:
+            yield line
+            prev_line = line
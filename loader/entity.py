@@ -0,0 +1,99 @@
+from rdflib import Graph
+
+
+class Entity:
+    """
+    Base for entities, which emit their triples into a sink.
+
+    A sink is anything with an add(triple) method, e.g., a Graph or one of the sinks in loader.sink.
+    Emitting into the sink being built avoids creating and merging a Graph for each entity.
+    """
+    def emit(self, g):
+        """
+        Add the entity's triples to a sink.
+
+        :param g: the sink
+        """
+        raise NotImplementedError
+
+    def to_graph(self):
+        """
+        Returns a new graph containing the entity's triples.
+        """
+        g = Graph()
+        self.emit(g)
+        return g
+
+
+class SharedEntityRegistry:
+    """
+    The triples of the shared entities of a data type, e.g., organizations, journals, research areas, events and
+    degrees.
+
+    Shared entities are referenced by many rows. Their triples are built the first time a row references them and
+    kept here, keyed by the values that determine the triples (not just the URI, since different data types may
+    label the same URI differently). The registry also records which shared entities have been added to the graph.
+
+    The triples are cleared for each data type, while the counts of shared entities built (misses) and not built
+    again (hits) are for the run.
+    """
+    def __init__(self):
+        self.triples = {}
+        self.added = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the triples of a shared entity or None if it must be built.
+        """
+        triples = self.triples.get(key)
+        if triples is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return triples
+
+    def put(self, key, triples):
+        """
+        Record the triples of a shared entity, unless they have already been recorded.
+
+        :return: the recorded triples
+        """
+        return self.triples.setdefault(key, triples)
+
+    def add(self, key):
+        """
+        Record a shared entity as added to the graph.
+
+        :return: True if it had not already been added
+        """
+        if key in self.added:
+            return False
+        self.added.add(key)
+        return True
+
+    def clear(self):
+        """
+        Forget the shared entities, e.g., before loading the next data type.
+        """
+        self.triples = {}
+        self.added = set()
+
+# The shared entities of the data type being loaded
+shared_entities = SharedEntityRegistry()
+
+
+def shared_entity_sink(g, key):
+    """
+    Returns the sink into which to emit the triples of a shared entity or None if they have already been emitted.
+
+    Sinks that keep shared entities apart (e.g., loader.sink.RowTriples) have a shared_entity(key) method.
+    Otherwise, the shared entity is emitted into the sink itself.
+
+    :param g: the sink
+    :param key: the values that determine the triples of the shared entity, starting with its URI
+    """
+    if hasattr(g, "shared_entity"):
+        return g.shared_entity(key)
+    return g
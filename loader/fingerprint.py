@@ -0,0 +1,91 @@
+import hashlib
+import json
+
+import os
+from loader.gwids import GwidSet
+
+
+class SourceFingerprint:
+    """
+    The fingerprint of the inputs to the last successful load of a data type.
+
+    The fingerprint is a hash of the data type's source files, the arguments to its load function (e.g., the gwids)
+    and the version of the loader code. If the fingerprint is unchanged, so is the graph, and the data type
+    can be skipped.
+
+    The fingerprint is kept in the graph archive directory as <prefix>.fingerprint.
+    """
+    def __init__(self, graph_dir, prefix):
+        """
+        :param graph_dir: the directory containing the graph files
+        :param prefix: prefix for the filename, i.e., the data type
+        """
+        self.prefix = prefix
+        self.filepath = os.path.join(graph_dir, "%s.fingerprint" % prefix)
+
+    def matches(self, fingerprint):
+        if not os.path.exists(self.filepath):
+            return False
+        with open(self.filepath) as fingerprint_file:
+            return fingerprint_file.read().strip() == fingerprint
+
+    def record(self, fingerprint):
+        with open(self.filepath, "w") as fingerprint_file:
+            fingerprint_file.write(fingerprint)
+
+    def clear(self):
+        """
+        Remove the fingerprint, e.g., before loading changed inputs, so that a failed load is not skipped next time.
+        """
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+
+def fingerprint(filepaths, func_args, version):
+    """
+    Returns the fingerprint of the inputs to a load function.
+
+    :param filepaths: the source files
+    :param func_args: the arguments to the load function
+    :param version: the version of the loader code, from code_version()
+    :return: hex digest
+    """
+    h = hashlib.sha1(version)
+    for filepath in filepaths:
+        h.update(os.path.basename(filepath))
+        if os.path.exists(filepath):
+            _update_from_file(h, filepath)
+        else:
+            h.update("missing")
+    h.update(json.dumps(func_args, sort_keys=True, default=_json_default))
+    return h.hexdigest()
+
+
+def code_version(filepaths=()):
+    """
+    Returns a hash of the source of the loader package.
+
+    :param filepaths: other source files to include, e.g., the script that maps data types to load functions
+    """
+    h = hashlib.sha1()
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in sorted(os.listdir(package_dir)):
+        if filename.endswith(".py"):
+            h.update(filename)
+            _update_from_file(h, os.path.join(package_dir, filename))
+    for filepath in filepaths:
+        h.update(os.path.basename(filepath))
+        _update_from_file(h, filepath)
+    return h.hexdigest()
+
+
+def _update_from_file(h, filepath):
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1048576), ""):
+            h.update(block)
+
+
+def _json_default(obj):
+    if isinstance(obj, (set, frozenset, GwidSet)):
+        return sorted(obj)
+    return repr(obj)
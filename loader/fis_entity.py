@@ -1,8 +1,9 @@
-from utility import to_hash_identifier, language_map, add_season_date, add_date, add_language, add_date_interval, \
+from utility import to_hash_uri, language_map, add_season_date, add_date, add_language, add_date_interval, \
     num_to_str, warning_log
 from orcid2vivo_app.utility import clean_orcid, is_valid_orcid
 from rdflib import Literal, RDF, RDFS, URIRef, OWL, XSD
 import re
+from entity import Entity, shared_entity_sink
 from prefixes import *
 from namespace import *
 import logging
@@ -10,7 +11,7 @@ import logging
 log = logging.getLogger(__name__)
 
 
-class Person:
+class Person(Entity):
     def __init__(self, netid, personal_statement=None, home_department=None, research_areas=None, languages_known=None,
                  languages_other=None, orcid_id=None, linkdin=None):
         self.netid = netid
@@ -25,10 +26,7 @@ class Person:
         self.uri = D[self.netid]
         self.vcard_uri = self.uri + "-vcard"
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Person type
         g.add((self.uri, RDF.type, VIVO.FacultyMember))
 
@@ -51,9 +49,12 @@ class Person:
                     research_area_split = re.split(", *", research_areas)
             for research_area in research_area_split:
                 if research_area:
-                    research_area_uri = D[to_hash_identifier(PREFIX_RESEARCH_AREA, [research_area, ])]
-                    g.add((research_area_uri, RDF.type, SKOS.concept))
-                    g.add((research_area_uri, RDFS.label, Literal(research_area[0].capitalize() + research_area[1:])))
+                    research_area_uri = to_hash_uri(PREFIX_RESEARCH_AREA, [research_area, ])
+                    research_area_label = research_area[0].capitalize() + research_area[1:]
+                    shared_g = shared_entity_sink(g, (research_area_uri, research_area_label))
+                    if shared_g is not None:
+                        shared_g.add((research_area_uri, RDF.type, SKOS.concept))
+                        shared_g.add((research_area_uri, RDFS.label, Literal(research_area_label)))
                     g.add((self.uri, VIVO.hasResearchArea, research_area_uri))
 
         # Home Department
@@ -90,10 +91,7 @@ class Person:
             g.add((vcard_linkdin_uri, RDFS.label, Literal("LinkedIn")))
 
 
-        return g
-
-
-class Organization:
+class Organization(Entity):
 
     def __init__(self, name, organization_type="Organization", is_gw=False, part_of=None):
         self.name = name
@@ -101,11 +99,14 @@ class Organization:
         self.is_gw = is_gw
         self.part_of = part_of
 
-        self.uri = D[to_hash_identifier(PREFIX_ORGANIZATION, (self.name,))]
+        self.uri = to_hash_uri(PREFIX_ORGANIZATION, (self.name,))
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+    def emit(self, g):
+        # Organizations are shared by many rows, so only emitted once
+        g = shared_entity_sink(g, (self.uri, self.organization_type, self.is_gw,
+                                   self.part_of.uri if self.part_of else None))
+        if g is None:
+            return
 
         # Department
         g.add((self.uri, RDF.type,
@@ -119,10 +120,8 @@ class Organization:
         if self.part_of:
             g.add((self.uri, OBO.BFO_0000050, self.part_of.uri))
 
-        return g
-
 
-class Appointment:
+class Appointment(Entity):
 
     def __init__(self, person, organization, rank, appt_type,
                  title=None, start_term=None, end_term=None):
@@ -134,13 +133,10 @@ class Appointment:
         self.start_term = start_term
         self.end_term = end_term
 
-        self.uri = D[
-            to_hash_identifier(PREFIX_APPOINTMENT, (person.uri, organization.uri, rank, title, start_term, end_term))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_APPOINTMENT,
+                               (person.uri, organization.uri, rank, title, start_term, end_term))
 
+    def emit(self, g):
         g.add((self.uri, RDF.type, self.appt_type))
         # Title otherwise rank
         g.add((self.uri, RDFS.label, Literal(self.title or self.rank)))
@@ -155,8 +151,6 @@ class Appointment:
                           interval_start_uri if add_season_date(interval_start_uri, self.start_term, g) else None,
                           interval_end_uri if add_season_date(interval_end_uri, self.end_term, g) else None)
 
-        return g
-
 
 class AcademicAppointment(Appointment):
 
@@ -174,7 +168,7 @@ class AdminAppointment(Appointment):
                              title=title, start_term=start_term, end_term=end_term)
 
 
-class Document:
+class Document(Entity):
 
     def __init__(self, person, title, start_year=None, start_month=None):
         self.title = title
@@ -182,12 +176,9 @@ class Document:
         self.start_year = start_year
         self.start_month = start_month
 
-        self.uri = D[to_hash_identifier(PREFIX_DOCUMENT, (person.uri, title, self._get_document_type()))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_DOCUMENT, (person.uri, title, self._get_document_type()))
 
+    def emit(self, g):
         # Type
         g.add((self.uri, RDF.type, self._get_document_type()))
 
@@ -205,8 +196,6 @@ class Document:
         g.add((self.uri, VIVO.dateTimeValue, date_uri))
         add_date(date_uri, self.start_year, g, self.start_month)
 
-        return g
-
     def _get_document_type(self):
         return BIBO.Document
 
@@ -220,15 +209,13 @@ class Book(Document):
     def _get_document_type(self):
         return BIBO.Book
 
-    def to_graph(self):
-        g = Document.to_graph(self)
+    def emit(self, g):
+        Document.emit(self, g)
 
         # Publisher
         if self.publisher:
             g.add((self.uri, VIVO.publisher, self.publisher.uri))
 
-        return g
-
 
 class Article(Document):
 
@@ -242,19 +229,19 @@ class Article(Document):
     def _get_publication_venue_type(self):
         return BIBO.Periodical
 
-    def to_graph(self):
-        g = Document.to_graph(self)
+    def emit(self, g):
+        Document.emit(self, g)
 
         # Publication venue
         if self.publication_venue:
-            journal_uri = D[to_hash_identifier(PREFIX_JOURNAL, (self._get_publication_venue_type(),
-                                                                self.publication_venue,))]
-            g.add((journal_uri, RDF.type, self._get_publication_venue_type()))
-            g.add((journal_uri, RDFS.label, Literal(self.publication_venue)))
+            journal_uri = to_hash_uri(PREFIX_JOURNAL, (self._get_publication_venue_type(),
+                                                       self.publication_venue,))
+            shared_g = shared_entity_sink(g, (journal_uri, self.publication_venue))
+            if shared_g is not None:
+                shared_g.add((journal_uri, RDF.type, self._get_publication_venue_type()))
+                shared_g.add((journal_uri, RDFS.label, Literal(self.publication_venue)))
             g.add((self.uri, VIVO.hasPublicationVenue, journal_uri))
 
-        return g
-
 
 class AcademicArticle(Article):
 
@@ -308,15 +295,13 @@ class Report(Document):
     def _get_document_type(self):
         return BIBO.Report
 
-    def to_graph(self):
-        g = Document.to_graph(self)
+    def emit(self, g):
+        Document.emit(self, g)
 
         # Distributor
         if self.distributor:
             g.add((self.uri, BIBO.distributor, self.distributor.uri))
 
-        return g
-
 
 class ConferenceDocument(Document):
 
@@ -324,17 +309,15 @@ class ConferenceDocument(Document):
         Document.__init__(self, person, title, start_year=start_year, start_month=start_month)
         self.conference = conference
 
-    def to_graph(self):
-        g = Document.to_graph(self)
+    def emit(self, g):
+        Document.emit(self, g)
 
         # Presented at
-        conference_uri = D[to_hash_identifier(PREFIX_EVENT, (self.conference,))]
+        conference_uri = to_hash_uri(PREFIX_EVENT, (self.conference,))
         g.add((conference_uri, RDF.type, BIBO.Conference))
         g.add((conference_uri, RDFS.label, Literal(self.conference)))
         g.add((self.uri, BIBO.presentedAt, conference_uri))
 
-        return g
-
 
 class ConferenceAbstract(ConferenceDocument):
 
@@ -354,7 +337,7 @@ class ConferencePoster(ConferenceDocument):
         return VIVO.ConferencePoster
 
 
-class Patent:
+class Patent(Entity):
 
     def __init__(self, person, title, patent=None, start_year=None, start_month=None):
         self.title = title
@@ -363,12 +346,9 @@ class Patent:
         self.start_month = start_month
         self.patent = patent
 
-        self.uri = D[to_hash_identifier(PREFIX_PATENT, (person.uri, title))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_PATENT, (person.uri, title))
 
+    def emit(self, g):
         # Type
         g.add((self.uri, RDF.type, BIBO.Patent))
 
@@ -387,10 +367,8 @@ class Patent:
         g.add((self.uri, VIVO.dateTimeValue, date_uri))
         add_date(date_uri, self.start_year, g, self.start_month)
 
-        return g
-
 
-class Grant:
+class Grant(Entity):
 
     def __init__(self, person, title, grant_role, start_year=None, start_month=None,
                  award_amount=None, awarded_by=None,
@@ -411,13 +389,10 @@ class Grant:
         self.awarded_by = awarded_by
 
         # Using start year, month to disambiguate grants, but not storing.
-        self.uri = D[to_hash_identifier(PREFIX_GRANT, (person.uri, title, grant_role,
-                                                       start_year, start_month))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_GRANT, (person.uri, title, grant_role,
+                                              start_year, start_month))
 
+    def emit(self, g):
         # Type
         g.add((self.uri, RDF.type, VIVO.Grant))
 
@@ -466,10 +441,8 @@ class Grant:
         if self.awarded_by:
             g.add((self.uri, VIVO.assignedBy, self.awarded_by.uri))
 
-        return g
 
-
-class DegreeEducation:
+class DegreeEducation(Entity):
 
     def __init__(self, person, organization, degree,
                  program=None, major=None, start_term=None, end_term=None):
@@ -480,12 +453,9 @@ class DegreeEducation:
         self.major = major
         self.start_term = start_term
         self.end_term = end_term
-        self.uri = D[to_hash_identifier(PREFIX_AWARDED_DEGREE, (person.uri, organization.uri, degree))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_AWARDED_DEGREE, (person.uri, organization.uri, degree))
 
+    def emit(self, g):
         # Awarded degree
         g.add((self.uri, RDF.type, VIVO.AwardedDegree))
         g.add((self.uri, RDFS.label, Literal(self.degree_name)))
@@ -493,9 +463,11 @@ class DegreeEducation:
         g.add((self.uri, VIVO.assignedBy, self.organization.uri))
 
         # Relates to degree
-        degree_uri = D[to_hash_identifier(PREFIX_DEGREE, (self.degree_name,))]
-        g.add((degree_uri, RDF.type, VIVO.AcademicDegree))
-        g.add((degree_uri, RDFS.label, Literal("%s degree" % self.degree_name)))
+        degree_uri = to_hash_uri(PREFIX_DEGREE, (self.degree_name,))
+        shared_g = shared_entity_sink(g, (degree_uri, self.degree_name))
+        if shared_g is not None:
+            shared_g.add((degree_uri, RDF.type, VIVO.AcademicDegree))
+            shared_g.add((degree_uri, RDFS.label, Literal("%s degree" % self.degree_name)))
         g.add((self.uri, VIVO.relates, degree_uri))
 
         # Relates to person
@@ -520,25 +492,20 @@ class DegreeEducation:
                           interval_start_uri if add_season_date(interval_start_uri, self.start_term, g) else None,
                           interval_end_uri if add_season_date(interval_end_uri, self.end_term, g) else None)
 
-        return g
 
-
-class NonDegreeEducation:
+class NonDegreeEducation(Entity):
 
     def __init__(self, person, organization, degree=None, program=None):
         self.person = person
         self.organization = organization
         self.degree = degree
         self.program = program
-        self.uri = D[to_hash_identifier(PREFIX_NON_DEGREE, (person.uri, organization.uri, degree, program))]
+        self.uri = to_hash_uri(PREFIX_NON_DEGREE, (person.uri, organization.uri, degree, program))
 
         self.start_term = None
         self.end_term = None
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # All are Postdoctoral-training, since can't differentiate
         # medical residencies, etc.
         g.add((self.uri, RDF.type, VIVO.PostdoctoralTraining))
@@ -555,21 +522,16 @@ class NonDegreeEducation:
                           interval_start_uri if add_season_date(interval_start_uri, self.start_term, g) else None,
                           interval_end_uri if add_season_date(interval_end_uri, self.end_term, g) else None)
 
-        return g
 
-
-class Course:
+class Course(Entity):
 
     def __init__(self, person, course_id, course=None):
         self.person = person
         self.course_id = course_id
         self.course = course
-        self.uri = D[to_hash_identifier(PREFIX_TEACHER, (person.uri, self.course_id))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_TEACHER, (person.uri, self.course_id))
 
+    def emit(self, g):
         # Teacher Role
         g.add((self.uri, RDF.type, VIVO.TeacherRole))
 
@@ -577,16 +539,14 @@ class Course:
         g.add((self.uri, OBO.RO_0000052, self.person.uri))
 
         # Realized in course
-        course_uri = D[to_hash_identifier(PREFIX_COURSE, (self.course_id,))]
+        course_uri = to_hash_uri(PREFIX_COURSE, (self.course_id,))
         g.add((course_uri, RDF.type, VIVO.Course))
         course_name = "%s (%s)" % (self.course, self.course_id)
         g.add((course_uri, RDFS.label, Literal(course_name)))
         g.add((self.uri, OBO.BFO_0000054, course_uri))
 
-        return g
 
-
-class ProfessionalMembership:
+class ProfessionalMembership(Entity):
 
     def __init__(self, person, organization, position=None,
                  start_year=None, start_month=None,
@@ -599,13 +559,10 @@ class ProfessionalMembership:
         self.end_year = end_year
         self.end_month = end_month
 
-        self.uri = D[to_hash_identifier(PREFIX_MEMBERSHIP, (person.uri, organization.uri, position, start_year,
-                                                            start_month, end_year, end_month))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_MEMBERSHIP, (person.uri, organization.uri, position, start_year,
+                                                   start_month, end_year, end_month))
 
+    def emit(self, g):
         # Contributes to Organization
         g.add((self.uri, VIVO.roleContributesTo, self.organization.uri))
 
@@ -632,10 +589,8 @@ class ProfessionalMembership:
                                                        g,
                                                        self.end_month) else None)
 
-        return g
 
-
-class Reviewership:
+class Reviewership(Entity):
 
     def __init__(self, person, journal, position=None,
                  start_year=None, start_month=None, end_year=None, end_month=None):
@@ -648,13 +603,10 @@ class Reviewership:
         self.end_year = None
         self.end_month = None
 
-        self.uri = D[to_hash_identifier(PREFIX_REVIEWERSHIP, (person.uri, journal, position, start_year, start_month,
-                                                              end_year, end_month))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_REVIEWERSHIP, (person.uri, journal, position, start_year, start_month,
+                                                     end_year, end_month))
 
+    def emit(self, g):
         # Reviewer role
         g.add((self.uri, RDF.type, VIVO.ReviewerRole))
         # Label is position
@@ -663,9 +615,11 @@ class Reviewership:
 
         # Contributes to Journal
         # Although it seems not all of these are journals
-        journal_uri = D[to_hash_identifier(PREFIX_JOURNAL, (self.journal,))]
-        g.add((journal_uri, RDF.type, BIBO.Journal))
-        g.add((journal_uri, RDFS.label, Literal(self.journal)))
+        journal_uri = to_hash_uri(PREFIX_JOURNAL, (self.journal,))
+        shared_g = shared_entity_sink(g, (journal_uri, self.journal))
+        if shared_g is not None:
+            shared_g.add((journal_uri, RDF.type, BIBO.Journal))
+            shared_g.add((journal_uri, RDFS.label, Literal(self.journal)))
         g.add((self.uri, VIVO.roleContributesTo, journal_uri))
 
         # Inheres in Person
@@ -685,10 +639,8 @@ class Reviewership:
                                                        g,
                                                        self.end_month) else None)
 
-        return g
 
-
-class Award:
+class Award(Entity):
 
     def __init__(self, person, award, organization=None, start_year=None, start_month=None):
         self.person = person
@@ -697,12 +649,9 @@ class Award:
         self.start_year = start_year
         self.start_month = start_month
 
-        self.uri = D[to_hash_identifier(PREFIX_AWARD_RECEIPT, (person.uri, award))]
-
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
+        self.uri = to_hash_uri(PREFIX_AWARD_RECEIPT, (person.uri, award))
 
+    def emit(self, g):
         # Award Receipt
         g.add((self.uri, RDF.type, VIVO.AwardReceipt))
         g.add((self.uri, RDFS.label, Literal("Awarded %s" % self.award)))
@@ -715,7 +664,7 @@ class Award:
         g.add((self.uri, VIVO.relates, self.person.uri))
 
         # Relates to Award
-        award_uri = D[to_hash_identifier(PREFIX_AWARD, (self.award,))]
+        award_uri = to_hash_uri(PREFIX_AWARD, (self.award,))
         g.add((award_uri, RDF.type, VIVO.Award))
         g.add((award_uri, RDFS.label, Literal(self.award)))
         g.add((self.uri, VIVO.relates, award_uri))
@@ -725,10 +674,8 @@ class Award:
         g.add((self.uri, VIVO.dateTimeValue, date_uri))
         add_date(date_uri, self.start_year, g, self.start_month)
 
-        return g
 
-
-class Presentation:
+class Presentation(Entity):
 
     def __init__(self, person, title, event, start_year=None, start_month=None):
         self.person = person
@@ -739,27 +686,26 @@ class Presentation:
         self.start_year = start_year
         self.start_month = start_month
 
-        self.uri = D[to_hash_identifier(PREFIX_PRESENTER, (person.uri, title, event, start_year, start_month))]
+        self.uri = to_hash_uri(PREFIX_PRESENTER, (person.uri, title, event, start_year, start_month))
 
     def _get_event_type(self):
         return BIBO.Conference
 
-    def to_graph(self):
-        # Create an RDFLib Graph
-        g = Graph()
-
+    def emit(self, g):
         # Presenter role
         g.add((self.uri, RDF.type, VIVO.PresenterRole))
 
         # Realized in presentation
-        presentation_uri = D[to_hash_identifier(PREFIX_PRESENTATION, (self.title,))]
+        presentation_uri = to_hash_uri(PREFIX_PRESENTATION, (self.title,))
         g.add((presentation_uri, RDF.type, VIVO.Presentation))
         g.add((presentation_uri, RDFS.label, Literal(self.title)))
         g.add((self.uri, OBO.BFO_0000054, presentation_uri))
         # Presentation part of Event
-        event_uri = D[to_hash_identifier(PREFIX_EVENT, (self.event,))]
-        g.add((event_uri, RDF.type, self._get_event_type()))
-        g.add((event_uri, RDFS.label, Literal(self.event)))
+        event_uri = to_hash_uri(PREFIX_EVENT, (self.event,))
+        shared_g = shared_entity_sink(g, (event_uri, self._get_event_type(), self.event))
+        if shared_g is not None:
+            shared_g.add((event_uri, RDF.type, self._get_event_type()))
+            shared_g.add((event_uri, RDFS.label, Literal(self.event)))
         g.add((presentation_uri, OBO.BFO_0000050, event_uri))
 
         # Inheres in person
@@ -774,8 +720,6 @@ class Presentation:
                                                          g,
                                                          self.start_month) else None)
 
-        return g
-
 
 class Testimony(Presentation):
 
@@ -1,5 +1,14 @@
 from fis_entity import *
-from utility import valid_college_name, valid_department_name, xml_result_generator, remove_extra_args
+from utility import valid_college_name, valid_department_name, xml_result_generator
+from fingerprint import code_version
+from rowcache import RowCache, row_key
+from sink import RowTriples, TripleList
+from entity import shared_entities
+from store import compact_graph
+from shard import xml_row_ranges, read_xml_range, ShardSink
+from gwids import gwid_set
+from multiprocessing import Pool, current_process
+import inspect
 import os
 
 GWU = "The George Washington University"
@@ -9,10 +18,14 @@ class Loader:
     def __init__(self, filename, data_dir,
                  gwids=None, entity_class=None, field_to_entity=None, field_rename=None,
                  add_entities_from_fields=None, field_to_lookup=None, remove_fields=None,
-                 limit=None):
+                 limit=None, row_cache_dir=None, parse_processes=None, sink=None):
         self.filename = filename
         self.data_dir = data_dir
         self.limit = limit
+        # Directory containing the caches of the triples for each row. None to not cache.
+        self.row_cache_dir = row_cache_dir
+        # Number of processes to parse the file with. None to parse in this process.
+        self.parse_processes = parse_processes
         # Map of result field names to (new field names, lookup map).
         self.field_lookup = field_to_lookup or {}
         # Map of result field names to entity classes. Classes must take a single positional argument.
@@ -26,68 +39,210 @@ class Loader:
         # List of fields to remove
         self.remove_fields = remove_fields or []
 
-        # Create an RDFLib Graph
-        self.g = Graph(namespace_manager=ns_manager)
+        # The sink for the triples, by default an RDFLib Graph
+        self.g = sink if sink is not None else compact_graph()
 
-        # Gwids
-        self.gwids = gwids
+        # Gwids, as a GwidSet so that checking the gwid of each row is a hash lookup
+        self.gwids = gwid_set(gwids)
+
+        # The plan for mapping a result to the arguments for the entity class
+        self.plan = self._compile_plan() if self.entity_class else None
+        # Fields of the arguments that contain entities that should be added to graph.
+        self.add_entity_args = [field for field in self.add_entities_from_fields
+                                if self.plan and field in dict(self.plan)]
 
     def load(self):
         addl_entities = self._addl_entities()
         for entity in addl_entities:
-            self.g += entity.to_graph()
+            entity.emit(self.g)
 
         try:
-            row_count = 0
-            for row_count, result in enumerate(xml_result_generator(os.path.join(self.data_dir, self.filename)),
-                                               start=1):
-                # Check the _use_result function
-                if (self._use_result(result) and
-                        # Optionally limit by faculty ids
-                        (self.gwids is None or result["gw_id"] in self.gwids)):
-                    # Optionally remove fields
-                    for field in self.remove_fields:
-                        if field in result:
-                            del result[field]
-
-                    # Optionally process the result to change values
-                    self._process_result(result)
-
-                    # Optionally lookup some result values
-                    for key, (new_key, lookup_map) in self.field_lookup.items():
-                        if key in result:
-                            result[new_key] = lookup_map[result[key]]
-                            if key != new_key:
-                                del result[key]
-
-                    # Optionally map some result values to entities (e.g., organization)
-                    for key, clazz in self.field_to_entity.items():
-                        if key in result:
-                            result[key] = clazz(result[key])
-
-                    # Optionally rename some fields
-                    for src_key, dest_key in self.field_rename.items():
-                        if src_key in result:
-                            result[dest_key] = result[src_key]
-                            del result[src_key]
-
-                    # Generate the entities
-                    entities = self._generate_entities(result)
-                    for entity in entities:
-                        self.g += entity.to_graph()
-                if self.limit and row_count > self.limit-1:
-                    break
+            row_cache = self._row_cache()
+            # Shared entities are built and added to the graph for each data type
+            shared_entities.clear()
+            filepath = os.path.join(self.data_dir, self.filename)
+            # Worker processes (e.g., loading data types in parallel) cannot start processes of their own.
+            if self.parse_processes > 1 and not current_process().daemon:
+                row_count = self._load_shards(filepath, row_cache)
+            else:
+                row_count = 0
+                for row_count, result in enumerate(xml_result_generator(filepath), start=1):
+                    # Check the _use_result function
+                    if (self._use_result(result) and
+                            # Optionally limit by faculty ids
+                            (self.gwids is None or result["gw_id"] in self.gwids)):
+                        if row_cache is None:
+                            triples = self._result_triples(result)
+                            self._add_row(triples, triples.shared)
+                        else:
+                            # Reuse the triples if the row is unchanged
+                            key = self._row_key(result)
+                            cached = row_cache.get(key)
+                            if cached is None:
+                                triples = self._result_triples(result)
+                                cached = (list(triples), triples.shared)
+                                row_cache.put(key, cached)
+                            self._add_row(cached[0], cached[1])
+                    if self.limit and row_count > self.limit-1:
+                        break
 
             if not row_count:
                 warning_log.error("%s has no data.", self.filename)
                 return None
 
+            if row_cache is not None:
+                print "Reused triples for %s rows and generated triples for %s rows." % (row_cache.hits,
+                                                                                        row_cache.misses)
+                row_cache.save()
             return self.g
         # If there is an IOError, log it and return None
         except IOError, e:
             warning_log.error("%s: %s", e.strerror, e.filename)
             return None
 
+    def _load_shards(self, filepath, row_cache):
+        """
+        Load the file by parsing ranges of rows in a pool of processes.
+
+        The results for the ranges are added in the order of the ranges, so the graph is the same as when parsing
+        in this process, including for limit and gwids.
+
+        :return: the number of rows read
+        """
+        (header, ranges) = xml_row_ranges(filepath, self.parse_processes * 4)
+        row_count = 0
+        pool = Pool(self.parse_processes, _init_shard_worker, (self, filepath, header, row_cache))
+        try:
+            for (shard_row_count, sink, events, (shared_hits, shared_misses)) in pool.imap(_load_shard, ranges):
+                self._merge_shard(row_count, sink, events, row_cache)
+                # The shared entities were built in the worker process, whose counts are not kept.
+                shared_entities.hits += shared_hits
+                shared_entities.misses += shared_misses
+                row_count += shard_row_count
+                if self.limit and row_count >= self.limit:
+                    row_count = self.limit
+                    break
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        return row_count
+
+    def _shard_triples(self, source, row_cache):
+        """
+        Generate the triples for a range of rows. Performed in a worker process.
+
+        :param source: file object for the range of rows
+        :return: the number of rows read, a ShardSink containing the triples, a list of events in row order and the
+        numbers of shared entities not built again and built. Events are ("shared", row number, key, start, end) for
+        the first reference to a shared entity and ("row", row number, start, end, row cache key, row cache hit,
+        keys of shared entities) for a row. The start and end are indexes of the triples in the ShardSink.
+        """
+        (shared_hits, shared_misses) = (shared_entities.hits, shared_entities.misses)
+        sink = ShardSink()
+        events = []
+        shared_keys = set()
+        row_count = 0
+        for row_count, result in enumerate(xml_result_generator(source), start=1):
+            if self._use_result(result) and (self.gwids is None or result["gw_id"] in self.gwids):
+                key = None
+                cached = None
+                if row_cache is not None:
+                    key = self._row_key(result)
+                    cached = row_cache.get(key)
+                if cached is None:
+                    triples = self._result_triples(result)
+                    shared = triples.shared
+                else:
+                    (triples, shared) = cached
+                    for shared_key, shared_triples in shared.iteritems():
+                        shared_entities.put(shared_key, shared_triples)
+                for shared_key, shared_triples in shared.iteritems():
+                    if shared_key not in shared_keys:
+                        shared_keys.add(shared_key)
+                        start = len(sink)
+                        sink += shared_triples
+                        events.append(("shared", row_count, shared_key, start, len(sink)))
+                start = len(sink)
+                sink += triples
+                events.append(("row", row_count, start, len(sink), key, cached is not None, shared.keys()))
+            # Rows past the limit in this range are also past the limit in the file.
+            if self.limit and row_count > self.limit-1:
+                break
+        return (row_count, sink, events,
+                (shared_entities.hits - shared_hits, shared_entities.misses - shared_misses))
+
+    def _merge_shard(self, row_offset, sink, events, row_cache):
+        """
+        Add the triples generated for a range of rows to the graph and the row cache.
+
+        :param row_offset: the number of rows in the file before the range
+        """
+        # Keys to triples of the shared entities in the range
+        shared = {}
+        for event in events:
+            if self.limit and row_offset + event[1] > self.limit:
+                break
+            if event[0] == "shared":
+                (_, row_number, key, start, end) = event
+                shared[key] = shared_entities.put(key, TripleList(sink.decode(start, end)))
+            else:
+                (_, row_number, start, end, key, hit, shared_keys) = event
+                triples = TripleList(sink.decode(start, end))
+                row_shared = dict((shared_key, shared[shared_key]) for shared_key in shared_keys)
+                self._add_row(triples, row_shared)
+                if row_cache is not None:
+                    # The row was looked up in a worker process, whose counts are not kept.
+                    if hit:
+                        row_cache.hits += 1
+                    else:
+                        row_cache.misses += 1
+                    # Records the row as seen
+                    if row_cache.lookup(key) is None:
+                        row_cache.put(key, (triples, row_shared))
+
+    def _result_triples(self, result):
+        """
+        Returns the triples for a result.
+        """
+        # Optionally process the result to change values
+        self._process_result(result)
+
+        # Generate the entities
+        triples = RowTriples(shared_entities)
+        for entity in self._generate_entities(result):
+            entity.emit(triples)
+        return triples
+
+    def _add_row(self, triples, shared):
+        """
+        Add the triples for a row and the shared entities it references to the graph.
+
+        :param triples: the triples of the row, without the shared entities
+        :param shared: map of keys to triples of the shared entities referenced by the row. Only those not already
+        added to the graph are added.
+        """
+        self.g += triples
+        for key, shared_triples in shared.iteritems():
+            if shared_entities.add(key):
+                # Triples from the row cache are also available to rows that are not cached.
+                self.g += shared_entities.put(key, shared_triples)
+
+    def _row_cache(self):
+        if self.row_cache_dir is None:
+            return None
+        # Cached triples are only valid for the same loader code and configuration.
+        version = row_key(code_version(), self.__class__.__name__,
+                          self.entity_class.__name__ if self.entity_class else None,
+                          sorted(self.remove_fields))
+        return RowCache(self.row_cache_dir, self.filename, version)
+
+    def _row_key(self, result):
+        # The row and the values looked up for it
+        return row_key(sorted(result.items()),
+                       [lookup_map.get(result.get(key)) for key, (new_key, lookup_map) in
+                        sorted(self.field_lookup.items())])
+
     def _addl_entities(self):
         return []
 
@@ -98,18 +253,84 @@ class Loader:
         pass
 
     def _generate_entities(self, result):
-        # Instantiate an entity using the result as keyword args
-        entities = [self._create_entity(self.entity_class, result)]
-        for field in self.add_entities_from_fields:
-            if field in result and result[field] and hasattr(result[field], "to_graph"):
-                entities.append(result[field])
+        # Instantiate an entity using the arguments from the result
+        args = self._entity_args(result)
+        entities = [self.entity_class(**args)]
+        for field in self.add_entity_args:
+            if field in args and args[field] and hasattr(args[field], "emit"):
+                entities.append(args[field])
 
         return entities
 
-    @staticmethod
-    def _create_entity(clazz, args):
-        remove_extra_args(args, clazz.__init__)
-        return clazz(**args)
+    def _entity_args(self, result):
+        """
+        Returns the arguments for the entity class for a result, following the plan.
+        """
+        args = {}
+        for arg, sources in self.plan:
+            for key, lookup_map, clazz in sources:
+                if key in result:
+                    value = result[key]
+                    if lookup_map is not None:
+                        value = lookup_map[value]
+                    if clazz is not None:
+                        value = clazz(value)
+                    args[arg] = value
+                    break
+        return args
+
+    def _compile_plan(self):
+        """
+        Compiles the field configuration into a plan for mapping a result to the arguments for the entity class.
+
+        For each argument, the plan lists the result fields that can provide it, in order of precedence, with
+        the lookup map and entity class to apply to the value. This is equivalent to removing fields, looking up
+        values, mapping values to entities and renaming fields, and then removing the fields that are not
+        arguments, but without reflection or changing the result for each row.
+
+        :return: list of (argument name, ((field name, lookup map or None, entity class or None), ...))
+        """
+        (arg_names, varargs, keywords, defaults) = inspect.getargspec(self.entity_class.__init__)
+        plan = []
+        for arg in arg_names[1:]:
+            sources = []
+            # A renamed field replaces the field
+            for src_key, dest_key in self.field_rename.items():
+                if dest_key == arg:
+                    sources.extend(self._field_sources(src_key))
+            if arg not in self.field_rename:
+                sources.extend(self._field_sources(arg))
+            if sources:
+                plan.append((arg, tuple(sources)))
+        return plan
+
+    def _field_sources(self, key):
+        """
+        Returns the result fields that can provide a field once values have been looked up and mapped to entities.
+        """
+        clazz = self.field_to_entity.get(key)
+        sources = []
+        # A looked up value replaces the field
+        for src_key, (new_key, lookup_map) in self.field_lookup.items():
+            if new_key == key and src_key not in self.remove_fields:
+                sources.append((src_key, lookup_map, clazz))
+        if key not in self.field_lookup and key not in self.remove_fields:
+            sources.append((key, None, clazz))
+        return sources
+
+
+# The loader, file and row cache of a worker process parsing ranges of rows, set by _init_shard_worker().
+shard_context = {}
+
+
+def _init_shard_worker(loader, filepath, header, row_cache):
+    shard_context.update(loader=loader, filepath=filepath, header=header, row_cache=row_cache)
+
+
+def _load_shard(byte_range):
+    (start, end) = byte_range
+    source = read_xml_range(shard_context["filepath"], shard_context["header"], start, end)
+    return shard_context["loader"]._shard_triples(source, shard_context["row_cache"])
 
 
 class BasicLoader(Loader):
@@ -121,12 +342,12 @@ class BasicLoader(Loader):
     """
 
     def __init__(self, filename, data_dir, entity_class, gwids, netid_lookup,
-                 limit=None):
+                 limit=None, row_cache_dir=None, parse_processes=None, sink=None):
         Loader.__init__(self, filename, data_dir, gwids=gwids, entity_class=entity_class,
                         field_to_entity={"netid": Person, "organization": Organization},
                         field_rename={"netid": "person"}, add_entities_from_fields=["organization"],
                         field_to_lookup={"gw_id": ("netid", netid_lookup)},
-                        limit=limit)
+                        limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
 
 
 class DepartmentLoader(Loader):
@@ -136,8 +357,9 @@ class DepartmentLoader(Loader):
                 "School of Media and Public Affairs",
                 "Corcoran School of the Arts & Design")
 
-    def __init__(self, data_dir, limit=None):
-        Loader.__init__(self, "fis_department.xml", data_dir, limit=limit)
+    def __init__(self, data_dir, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
+        Loader.__init__(self, "fis_department.xml", data_dir, limit=limit, row_cache_dir=row_cache_dir,
+                        parse_processes=parse_processes, sink=sink)
         self.gwu = Organization(GWU, organization_type="University", is_gw=True)
 
     def _addl_entities(self):
@@ -156,20 +378,21 @@ class DepartmentLoader(Loader):
         return [c, d]
 
 
-def load_departments(data_dir, limit=None):
+def load_departments(data_dir, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
     print "Loading departments."
 
-    l = DepartmentLoader(data_dir, limit=limit)
+    l = DepartmentLoader(data_dir, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
 class FacultyLoader(Loader):
-    def __init__(self, data_dir, gwids, netid_lookup, is_mediaexpert, limit=None):
+    def __init__(self, data_dir, gwids, netid_lookup, is_mediaexpert, limit=None, row_cache_dir=None,
+                 parse_processes=None, sink=None):
         Loader.__init__(self, "fis_faculty.xml", data_dir, gwids=gwids, entity_class=Person,
                         field_to_entity={"home_department": Organization},
                         field_to_lookup={"gw_id": ("netid", netid_lookup)},
                         remove_fields=["research_areas", "personal_statement"] if is_mediaexpert else None,
-                        limit=limit)
+                        limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
 
     def _process_result(self, result):
         if not (valid_department_name(result["home_department"]) and valid_college_name(result["home_college"])):
@@ -177,21 +400,23 @@ class FacultyLoader(Loader):
             del result["home_department"]
 
 
-def load_faculty(data_dir, faculty_gwids, netid_lookup, is_mediaexpert=False, limit=None):
+def load_faculty(data_dir, faculty_gwids, netid_lookup, is_mediaexpert=False, limit=None, row_cache_dir=None,
+                 parse_processes=None, sink=None):
     print "Loading faculty."
 
-    l = FacultyLoader(data_dir, faculty_gwids, netid_lookup, is_mediaexpert=is_mediaexpert, limit=limit)
+    l = FacultyLoader(data_dir, faculty_gwids, netid_lookup, is_mediaexpert=is_mediaexpert, limit=limit,
+                      row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
 class AcademicAppointmentLoader(Loader):
-    def __init__(self, data_dir, gwids, netid_lookup, limit=None):
+    def __init__(self, data_dir, gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
         Loader.__init__(self, "fis_academic_appointment.xml", data_dir, gwids=gwids,
                         entity_class=AcademicAppointment,
                         field_to_entity={"organization": Organization, "netid": Person},
                         field_rename={"netid": "person"},
                         field_to_lookup={"gw_id": ("netid", netid_lookup)},
-                        limit=limit)
+                        limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
 
     def _use_result(self, result):
         return valid_department_name(result["department"]) or valid_college_name(result["college"])
@@ -204,21 +429,23 @@ class AcademicAppointmentLoader(Loader):
             result["organization"] = result["college"]
 
 
-def load_academic_appointment(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_academic_appointment(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                              parse_processes=None, sink=None):
     print "Loading academic appointments."
 
-    l = AcademicAppointmentLoader(data_dir, faculty_gwids, netid_lookup, limit=limit)
+    l = AcademicAppointmentLoader(data_dir, faculty_gwids, netid_lookup, limit=limit, row_cache_dir=row_cache_dir,
+                                  parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
 class AdminAppointmentLoader(Loader):
-    def __init__(self, data_dir, gwids, netid_lookup, limit=None):
+    def __init__(self, data_dir, gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
         Loader.__init__(self, "fis_admin_appointment.xml", data_dir, gwids=gwids,
                         entity_class=AdminAppointment,
                         field_to_entity={"organization": Organization, "netid": Person},
                         field_rename={"netid": "person"},
                         field_to_lookup={"gw_id": ("netid", netid_lookup)},
-                        limit=limit)
+                        limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
         self.gwu = Organization(GWU, organization_type="University", is_gw=True)
 
     def _addl_entities(self):
@@ -236,14 +463,17 @@ class AdminAppointmentLoader(Loader):
             result["organization"] = GWU
 
 
-def load_admin_appointment(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_admin_appointment(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                           parse_processes=None, sink=None):
     print "Loading admin appointments."
 
-    l = AdminAppointmentLoader(data_dir, faculty_gwids, netid_lookup, limit=limit)
+    l = AdminAppointmentLoader(data_dir, faculty_gwids, netid_lookup, limit=limit, row_cache_dir=row_cache_dir,
+                               parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                          sink=None):
     print "Loading degree education."
 
     l = Loader("fis_degree_education.xml", data_dir, gwids=faculty_gwids, entity_class=DegreeEducation,
@@ -251,11 +481,12 @@ def load_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None):
                field_rename={"institution": "organization", "netid": "person"},
                add_entities_from_fields=["organization"],
                field_to_lookup={"gw_id": ("netid", netid_lookup)},
-               limit=limit)
+               limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_non_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_non_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                              parse_processes=None, sink=None):
     print "Loading non-degree education."
 
     l = Loader("fis_non_degree_education.xml", data_dir, gwids=faculty_gwids, entity_class=NonDegreeEducation,
@@ -263,184 +494,201 @@ def load_non_degree_education(data_dir, faculty_gwids, netid_lookup, limit=None)
                field_rename={"institution": "organization", "netid": "person"},
                add_entities_from_fields=["organization"],
                field_to_lookup={"gw_id": ("netid", netid_lookup)},
-               limit=limit)
+               limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_courses(data_dir, faculty_gwids, netid_lookup, limit=None,):
+def load_courses(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                 sink=None):
     print "Loading courses taught."
 
     l = BasicLoader("fis_courses.xml", data_dir, Course, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_awards(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_awards(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
     print "Loading awards."
 
     l = BasicLoader("fis_awards.xml", data_dir, Award, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_professional_memberships(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_professional_memberships(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                                  parse_processes=None, sink=None):
     print "Loading professional memberships."
 
     l = BasicLoader("fis_prof_memberships.xml", data_dir, ProfessionalMembership, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_reviewerships(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_reviewerships(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                       sink=None):
     print "Loading reviewerships."
 
     l = BasicLoader("fis_reviewer.xml", data_dir, Reviewership, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_presentations(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_presentations(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                       sink=None):
     print "Loading presentations."
 
     l = BasicLoader("fis_presentations.xml", data_dir, Presentation, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_books(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_books(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
     print "Loading books."
 
     l = Loader("fis_books.xml", data_dir, gwids=faculty_gwids, entity_class=Book,
                field_to_entity={"netid": Person, "publisher": Organization},
                field_rename={"netid": "person"}, add_entities_from_fields=["publisher"],
                field_to_lookup={"gw_id": ("netid", netid_lookup)},
-               limit=limit)
+               limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_reports(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_reports(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                 sink=None):
     print "Loading reports."
 
     l = Loader("fis_reports.xml", data_dir, gwids=faculty_gwids, entity_class=Report,
                field_to_entity={"netid": Person, "distributor": Organization},
                field_rename={"netid": "person"}, add_entities_from_fields=["distributor"],
                field_to_lookup={"gw_id": ("netid", netid_lookup)},
-               limit=limit)
+               limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_articles(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_articles(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                  sink=None):
     print "Loading articles"
 
     l = BasicLoader("fis_articles.xml", data_dir, Article, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_academic_articles(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_academic_articles(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                           parse_processes=None, sink=None):
     print "Loading academic articles"
 
     l = BasicLoader("fis_acad_articles.xml", data_dir, AcademicArticle, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_article_abstracts(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_article_abstracts(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                           parse_processes=None, sink=None):
     print "Loading article abstracts"
 
     l = BasicLoader("fis_article_abstracts.xml", data_dir, ArticleAbstract, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_reviews(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_reviews(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                 sink=None):
     print "Loading reviews"
 
     l = BasicLoader("fis_reviews.xml", data_dir, Review, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_reference_articles(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_reference_articles(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                            parse_processes=None, sink=None):
     print "Loading reference articles"
 
     l = BasicLoader("fis_ref_articles.xml", data_dir, ReferenceArticle, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_letters(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_letters(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                 sink=None):
     print "Loading letters"
 
     l = BasicLoader("fis_letters.xml", data_dir, Letter, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_testimony(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_testimony(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                   sink=None):
     print "Loading testimony"
 
     l = BasicLoader("fis_testimony.xml", data_dir, Testimony, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_chapters(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_chapters(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                  sink=None):
     print "Loading chapters"
 
     l = BasicLoader("fis_chapters.xml", data_dir, Chapter, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_conference_abstracts(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_conference_abstracts(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                              parse_processes=None, sink=None):
     print "Loading conference abstracts"
 
     l = BasicLoader("fis_conf_abstracts.xml", data_dir, ConferenceAbstract, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_conference_papers(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_conference_papers(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                           parse_processes=None, sink=None):
     print "Loading conference papers"
 
     l = BasicLoader("fis_conf_papers.xml", data_dir, ConferencePaper, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_conference_posters(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_conference_posters(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                            parse_processes=None, sink=None):
     print "Loading conference posters"
 
     l = BasicLoader("fis_conf_posters.xml", data_dir, ConferencePoster, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_patents(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_patents(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                 sink=None):
     print "Loading patents"
 
     l = BasicLoader("fis_patents.xml", data_dir, Patent, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
 class GrantLoader(Loader):
-    def __init__(self, data_dir, gwids, netid_lookup, limit=None):
+    def __init__(self, data_dir, gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
         Loader.__init__(self, "fis_grants.xml", data_dir, gwids=gwids,
                         entity_class=Grant,
                         field_to_entity={"awarded_by": Organization, "netid": Person},
                         field_rename={"netid": "person"},
                         field_to_lookup={"gw_id": ("netid", netid_lookup)},
-                        limit=limit)
+                        limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
 
     def _use_result(self, result):
         return result["title"]
 
 
-def load_grants(data_dir, faculty_gwids, netid_lookup, limit=None):
+def load_grants(data_dir, faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None, sink=None):
     print "Loading grants."
 
     l = GrantLoader(data_dir, faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+from itertools import islice
+
+
+class GwidSet(object):
+    """
+    An ordered set of gwids.
+
+    Membership is a hash lookup, so checking the gwid of each row of a data file does not depend on the number of
+    gwids. Iteration is in the order in which the gwids were first added (e.g., the order of the data file), so
+    limiting to the first gwids (e.g., --faculty-limit) takes the same gwids on every run.
+
+    Set operations return a GwidSet in the order of this set.
+    """
+    def __init__(self, gwids=()):
+        """
+        :param gwids: iterable of gwids. Duplicates are ignored.
+        """
+        self._gwids = OrderedDict.fromkeys(gwids)
+
+    def __contains__(self, gw_id):
+        return gw_id in self._gwids
+
+    def __iter__(self):
+        return iter(self._gwids)
+
+    def __len__(self):
+        return len(self._gwids)
+
+    def __eq__(self, other):
+        if isinstance(other, GwidSet):
+            other = other._gwids.viewkeys()
+        elif not isinstance(other, (set, frozenset)):
+            return NotImplemented
+        return self._gwids.viewkeys() == other
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "GwidSet(%r)" % list(self._gwids)
+
+    def add(self, gw_id):
+        self._gwids[gw_id] = None
+
+    def update(self, gwids):
+        for gw_id in gwids:
+            self._gwids[gw_id] = None
+
+    def remove(self, gw_id):
+        """
+        Removes a gwid. Raises KeyError if it is not in the set.
+        """
+        del self._gwids[gw_id]
+
+    def discard(self, gw_id):
+        self._gwids.pop(gw_id, None)
+
+    def limit(self, count):
+        """
+        Returns a GwidSet of the first gwids.
+
+        :param count: the number of gwids or None for all
+        """
+        return GwidSet(islice(self._gwids, count))
+
+    def intersection(self, gwids):
+        gwids = _members(gwids)
+        return GwidSet(gw_id for gw_id in self._gwids if gw_id in gwids)
+
+    def difference(self, gwids):
+        gwids = _members(gwids)
+        return GwidSet(gw_id for gw_id in self._gwids if gw_id not in gwids)
+
+    def union(self, gwids):
+        union = GwidSet(self)
+        union.update(gwids)
+        return union
+
+    def __and__(self, gwids):
+        return self.intersection(gwids)
+
+    def __sub__(self, gwids):
+        return self.difference(gwids)
+
+    def __or__(self, gwids):
+        return self.union(gwids)
+
+
+def gwid_set(gwids):
+    """
+    Returns gwids (e.g., a list) as a GwidSet. A GwidSet or None is returned as is.
+    """
+    if gwids is None or isinstance(gwids, GwidSet):
+        return gwids
+    return GwidSet(gwids)
+
+
+def _members(gwids):
+    # Something with hashed membership
+    if isinstance(gwids, (GwidSet, set, frozenset, dict)):
+        return gwids
+    return set(gwids)
@@ -0,0 +1,148 @@
+import threading
+
+import codecs
+import os
+from loader.namespace import ns_manager
+from loader.ntriples import triple_to_nt
+from rdflib import Graph
+
+ADD = "add"
+DELETE = "delete"
+
+
+class TripleLog:
+    """
+    An ordered log of chunks of triples that were added or deleted.
+
+    The log is N-Triples, with a comment line before each chunk indicating whether it was added or deleted.
+    """
+    def __init__(self, filepath):
+        """
+        :param filepath: the log file
+        """
+        self.filepath = filepath
+        self.lock = threading.Lock()
+
+    def record_added(self, triples):
+        self._append(ADD, triples)
+
+    def record_deleted(self, triples):
+        self._append(DELETE, triples)
+
+    def exists(self):
+        return os.path.exists(self.filepath)
+
+    def apply(self, g):
+        """
+        Apply the chunks, in order, to a graph.
+
+        :param g: the graph
+        :return: the graph
+        """
+        added_count = 0
+        deleted_count = 0
+        for op, lines in self._chunks():
+            chunk_g = Graph(namespace_manager=ns_manager)
+            chunk_g.parse(data=u"".join(lines), format="nt")
+            for tr in chunk_g:
+                if op == ADD:
+                    g.add(tr)
+                    added_count += 1
+                else:
+                    g.remove(tr)
+                    deleted_count += 1
+        if added_count or deleted_count:
+            print "Applied %s of %s added and %s deleted triples." % (os.path.basename(self.filepath), added_count,
+                                                                     deleted_count)
+        return g
+
+    def line_sets(self):
+        """
+        Returns the net effect of the chunks.
+
+        :return: set of UTF-8 encoded N-Triples lines added and set of lines deleted
+        """
+        return net_line_sets([self])
+
+    def clear(self):
+        """
+        Remove the log.
+        """
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    def _chunks(self):
+        if not os.path.exists(self.filepath):
+            return []
+        with open(self.filepath, "rb") as log_file:
+            log = log_file.read()
+        # A chunk may have been partially written when interrupted. Those triples will just be sent again.
+        log = log[:log.rfind("\n") + 1].decode("utf-8")
+        return _chunk_generator(log)
+
+    def _append(self, op, triples):
+        chunk = u"# %s\n%s" % (op, u"".join(triple_to_nt(tr) for tr in triples))
+        with self.lock:
+            with codecs.open(self.filepath, "a", encoding="utf-8") as log_file:
+                log_file.write(chunk)
+                log_file.flush()
+                os.fsync(log_file.fileno())
+
+
+class ChunkJournal(TripleLog):
+    """
+    Records the chunks of triples that the SPARQL server has acknowledged adding or deleting for a data type.
+
+    The journal is kept in the graph archive directory until the graph is archived. If a load is interrupted,
+    applying the journal to the previous graph gives what is actually in VIVO, so that the next diff only
+    contains the unacknowledged remainder. Once the load completes, the journal is the delta from the
+    previous graph and can be archived as such.
+    """
+    def __init__(self, graph_dir, prefix):
+        """
+        :param graph_dir: the directory containing the graph files
+        :param prefix: prefix for the filename, i.e., the data type
+        """
+        TripleLog.__init__(self, os.path.join(graph_dir, "%s.journal" % prefix))
+        self.prefix = prefix
+
+
+def net_line_sets(logs):
+    """
+    Returns the net effect of applying logs in order.
+
+    :param logs: the TripleLogs
+    :return: set of UTF-8 encoded N-Triples lines added and set of lines deleted
+    """
+    added = set()
+    deleted = set()
+    for log in logs:
+        for op, lines in log._chunks():
+            for line in lines:
+                line = line.encode("utf-8")
+                if op == ADD:
+                    added.add(line)
+                    deleted.discard(line)
+                else:
+                    deleted.add(line)
+                    added.discard(line)
+    if added or deleted:
+        print "Applying %s of %s added and %s deleted triples." % (
+            ", ".join([os.path.basename(log.filepath) for log in logs]), len(added), len(deleted))
+    return added, deleted
+
+
+def _chunk_generator(log):
+    op = None
+    lines = []
+    # Not using splitlines(), since literals may contain other line boundaries.
+    for line in log.split(u"\n"):
+        if line.startswith(u"# "):
+            if lines:
+                yield op, lines
+            op = line[2:].strip()
+            lines = []
+        elif op and line:
+            lines.append(line + u"\n")
+    if lines:
+        yield op, lines
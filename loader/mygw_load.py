@@ -6,56 +6,67 @@ import os
 from loader.fis_entity import Award, ProfessionalMembership, Reviewership, Presentation
 from loader.fis_entity import Person
 from rdflib import Literal, RDF, RDFS, XSD
-from utility import xml_result_generator, add_language, warning_log, join_if_not_empty, to_hash_identifier, \
+from utility import xml_result_generator, add_language, warning_log, join_if_not_empty, to_hash_uri, \
     add_multimedia
 from namespace import *
+from store import compact_graph
+from sink import SharedEntityFilter
+from entity import shared_entity_sink
+from gwids import gwid_set
 from prefixes import PREFIX_RESEARCH_AREA, PREFIX_MULTIMEDIA
 import logging
 
 log = logging.getLogger(__name__)
 
 
-def load_awards(data_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_awards(data_dir, non_faculty_gwids, netid_lookup, limit=None, row_cache_dir=None, parse_processes=None,
+                sink=None):
     print "Loading mygw awards."
 
     l = BasicLoader("mygw_award.xml", data_dir, Award, non_faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_professional_memberships(data_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_professional_memberships(data_dir, non_faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                                  parse_processes=None, sink=None):
     print "Loading mygw professional memberships."
 
     l = BasicLoader("mygw_membership.xml", data_dir, ProfessionalMembership, non_faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_reviewerships(data_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_reviewerships(data_dir, non_faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                       parse_processes=None, sink=None):
     print "Loading mygw reviewerships."
 
     l = BasicLoader("mygw_editorial.xml", data_dir, Reviewership, non_faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_presentations(data_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_presentations(data_dir, non_faculty_gwids, netid_lookup, limit=None, row_cache_dir=None,
+                       parse_processes=None, sink=None):
     print "Loading mygw presentations."
 
     l = BasicLoader("mygw_presentation.xml", data_dir, Presentation, non_faculty_gwids,
-                    netid_lookup, limit=limit)
+                    netid_lookup, limit=limit, row_cache_dir=row_cache_dir, parse_processes=parse_processes, sink=sink)
     return l.load()
 
 
-def load_users(data_dir, store_dir, non_faculty_gwids, netid_lookup, limit=None):
+def load_users(data_dir, store_dir, non_faculty_gwids, netid_lookup, limit=None, sink=None):
     print "Loading mygw users."
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
 
     # Setup orcid2vivo store
     store = orcid2vivo_loader.Store(store_dir)
     # Set everyone to inactive
     store.delete_all()
 
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
+    # Languages are only added once
+    shared_filter = SharedEntityFilter(g)
 
     for result_num, result in enumerate(xml_result_generator(os.path.join(data_dir, "mygw_users.xml"))):
         if result["gw_id"] in non_faculty_gwids:
@@ -72,17 +83,21 @@ def load_users(data_dir, store_dir, non_faculty_gwids, netid_lookup, limit=None)
             if result["languages"]:
                 languages = result["languages"].split(",")
                 for language in languages:
-                    add_language(language, person.uri, g)
+                    add_language(language, person.uri, shared_filter)
             if limit and result_num >= limit - 1:
                 break
 
     return g
 
 
-def load_mediaexperts(data_dir, store_dir, non_faculty_gwids, faculty_gwids, netid_lookup, limit=None):
+def load_mediaexperts(data_dir, store_dir, non_faculty_gwids, faculty_gwids, netid_lookup, limit=None, sink=None):
     print "Loading mediaexperts"
+    non_faculty_gwids = gwid_set(non_faculty_gwids)
+    faculty_gwids = gwid_set(faculty_gwids)
 
-    g = Graph(namespace_manager=ns_manager)
+    g = sink if sink is not None else compact_graph()
+    # Research areas are only added once
+    shared_filter = SharedEntityFilter(g)
 
     for result_num, result in enumerate(xml_result_generator(os.path.join(data_dir, "mygw_mediaexperts.xml"))):
         if result["gw_id"] in non_faculty_gwids or result["gw_id"] in faculty_gwids:
@@ -119,23 +134,25 @@ def load_mediaexperts(data_dir, store_dir, non_faculty_gwids, faculty_gwids, net
 
             # Add media mentions
             if result["media_mentions"]:
-                add_multimedia(result["media_mentions"], person.uri, LOCAL.mediaMentions, g)
+                add_multimedia(result["media_mentions"], person.uri, LOCAL.mediaMentions, shared_filter)
 
             # Add commentary
             if result["commentary"]:
-                add_multimedia(result["commentary"], person.uri, LOCAL.commentary, g)
+                add_multimedia(result["commentary"], person.uri, LOCAL.commentary, shared_filter)
 
             # Add research areas
             if result["research_areas"]:
                 for research_area in result["research_areas"].split(","):
-                    research_area_uri = D[to_hash_identifier(PREFIX_RESEARCH_AREA, [research_area, ])]
-                    g.add((research_area_uri, RDF.type, SKOS.concept))
-                    g.add((research_area_uri, RDFS.label, Literal(research_area)))
+                    research_area_uri = to_hash_uri(PREFIX_RESEARCH_AREA, [research_area, ])
+                    shared_g = shared_entity_sink(shared_filter, (research_area_uri, research_area))
+                    if shared_g is not None:
+                        shared_g.add((research_area_uri, RDF.type, SKOS.concept))
+                        shared_g.add((research_area_uri, RDFS.label, Literal(research_area)))
                     g.add((person.uri, VIVO.hasResearchArea, research_area_uri))
 
             # Add multimedia
             if result["multimedia"]:
-                add_multimedia(result["multimedia"], person.uri, LOCAL.multimedia, g)
+                add_multimedia(result["multimedia"], person.uri, LOCAL.multimedia, shared_filter)
             if limit and result_num >= limit - 1:
                 break
 
@@ -0,0 +1,124 @@
+import re
+
+import codecs
+from rdflib import URIRef, Literal, BNode
+
+# Characters that must be escaped in an IRI.
+_iri_escape_re = re.compile(u'[\x00-\x20<>"{}|^`\\\\]')
+# Characters that must be escaped in a literal.
+_literal_escape_re = re.compile(u'["\\\\\n\r]')
+_literal_escapes = {
+    u'"': u'\\"',
+    u'\\': u'\\\\',
+    u'\n': u'\\n',
+    u'\r': u'\\r'
+}
+
+
+def term_to_nt(term):
+    """
+    Returns the N-Triples representation of an rdflib term.
+    """
+    if isinstance(term, URIRef):
+        return u"<%s>" % _escape_iri(term)
+    if isinstance(term, Literal):
+        value = _literal_escape_re.sub(_escape_literal_char, term)
+        if term.language:
+            return u'"%s"@%s' % (value, term.language)
+        if term.datatype:
+            return u'"%s"^^<%s>' % (value, _escape_iri(term.datatype))
+        return u'"%s"' % value
+    if isinstance(term, BNode):
+        return u"_:%s" % term
+    raise ValueError("Cannot write %r as N-Triples" % (term,))
+
+
+def triple_to_nt(triple):
+    """
+    Returns the N-Triples line, including the line ending, for a triple.
+
+    A line that is already N-Triples, e.g., from an NTriplesFile, is returned as is.
+    """
+    if isinstance(triple, basestring):
+        return triple
+    s, p, o = triple
+    return u"%s %s %s .\n" % (term_to_nt(s), term_to_nt(p), term_to_nt(o))
+
+
+def triple_size(triple):
+    """
+    Returns the size in bytes of the UTF-8 encoded N-Triples line for a triple.
+    """
+    return len(triple_to_nt(triple).encode("utf-8"))
+
+
+def ntriples_generator(triples, chunk_size=65536):
+    """
+    Generator for N-Triples for the provided triples.
+
+    Lines are grouped into strings of roughly chunk_size characters.
+    """
+    lines = []
+    lines_size = 0
+    for triple in triples:
+        line = triple_to_nt(triple)
+        lines.append(line)
+        lines_size += len(line)
+        if lines_size >= chunk_size:
+            yield u"".join(lines)
+            lines = []
+            lines_size = 0
+    if lines:
+        yield u"".join(lines)
+
+
+def write_ntriples(triples, filepath):
+    """
+    Writes the provided triples to a file as N-Triples.
+    """
+    with codecs.open(filepath, "w", encoding="utf-8") as out:
+        for chunk in ntriples_generator(triples):
+            out.write(chunk)
+
+
+class NTriplesFile:
+    """
+    A file of N-Triples lines, one triple per line.
+
+    Iterating provides the lines, which can be used in place of triples with the functions in this module
+    and with the SPARQL functions.
+    """
+    def __init__(self, filepath, count=None):
+        """
+        :param filepath: the N-Triples file
+        :param count: the number of lines in the file, if known
+        """
+        self.filepath = filepath
+        self.count = count
+
+    def __len__(self):
+        if self.count is None:
+            self.count = sum(1 for _ in self.raw_lines())
+        return self.count
+
+    def __iter__(self):
+        for line in self.raw_lines():
+            yield line.decode("utf-8")
+
+    def raw_lines(self):
+        """
+        Generator for the UTF-8 encoded lines.
+        """
+        with open(self.filepath, "rb") as nt_file:
+            for line in nt_file:
+                yield line
+
+
+def _escape_iri(iri):
+    if _iri_escape_re.search(iri):
+        return _iri_escape_re.sub(lambda m: u"\\u%04X" % ord(m.group()), iri)
+    return iri
+
+
+def _escape_literal_char(match):
+    return _literal_escapes[match.group()]
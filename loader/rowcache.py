@@ -0,0 +1,86 @@
+import cPickle
+import hashlib
+
+import os
+
+
+class RowCache:
+    """
+    The triples produced by each row of a source file, keyed by a hash of the row.
+
+    Rows that are unchanged since the last load reuse their triples rather than being mapped to entities again.
+    Only the rows seen by the current load are saved, so rows removed from the source file are dropped.
+
+    The cache is invalidated entirely when its version, e.g., the loader code, changes.
+    """
+    def __init__(self, cache_dir, name, version):
+        """
+        :param cache_dir: the directory containing the row caches
+        :param name: name of the cache, e.g., the source filename
+        :param version: the version of the cache, e.g., a hash of the loader code and configuration
+        """
+        self.filepath = os.path.join(cache_dir, "%s.rowcache" % name)
+        self.version = version
+        self.rows = self._read()
+        self.seen_rows = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached triples for a row or None.
+        """
+        triples = self.lookup(key)
+        if triples is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return triples
+
+    def lookup(self, key):
+        """
+        Returns the cached triples for a row or None, without counting a hit or miss, e.g., for a row that has
+        already been counted.
+
+        The row is recorded as seen if it is cached.
+        """
+        triples = self.rows.get(key)
+        if triples is not None:
+            self.seen_rows[key] = triples
+        return triples
+
+    def put(self, key, triples):
+        """
+        Record the triples for a row, e.g., a list of triples. They must be picklable.
+        """
+        self.seen_rows[key] = triples
+
+    def save(self):
+        """
+        Save the rows seen by this load.
+        """
+        dirname = os.path.dirname(self.filepath)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        tmp_filepath = os.path.join(dirname, ".%s" % os.path.basename(self.filepath))
+        with open(tmp_filepath, "wb") as cache_file:
+            cPickle.dump((self.version, self.seen_rows), cache_file, cPickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_filepath, self.filepath)
+
+    def _read(self):
+        if not os.path.exists(self.filepath):
+            return {}
+        try:
+            with open(self.filepath, "rb") as cache_file:
+                (version, rows) = cPickle.load(cache_file)
+        # A cache that cannot be read (e.g., truncated or pickled with classes that have since changed) is a miss.
+        except Exception:
+            return {}
+        return rows if version == self.version else {}
+
+
+def row_key(*values):
+    """
+    Returns a key for a row from the values that determine its triples.
+    """
+    return hashlib.sha1(repr(values)).digest()
@@ -0,0 +1,111 @@
+import traceback
+from multiprocessing import Process, Pipe
+
+from loader.utility import warning_log
+
+
+class DataTypeScheduler:
+    """
+    Runs data types in processes, one process per data type.
+
+    A data type is started once the data types that it depends on have finished. Data types that do not depend on
+    each other, e.g., the FIS publications, run at the same time. Otherwise, data types are started in the order
+    given.
+    """
+    def __init__(self, dependencies, processes=2, initializer=None, initargs=(), poll_interval=1):
+        """
+        :param dependencies: map of data type to the data types that must finish before it is started
+        :param processes: maximum number of data types to run at the same time
+        :param initializer: function called in each process before the data type is run
+        :param initargs: arguments for the initializer. Since processes are forked, these can include
+        objects that cannot be pickled, e.g., a multiprocessing.BoundedSemaphore.
+        :param poll_interval: seconds between checks for processes that have exited
+        """
+        self.dependencies = dependencies
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+        self.poll_interval = poll_interval
+
+    def run(self, data_types, func):
+        """
+        Run a function for each data type.
+
+        Dependencies on data types that are not being run (e.g., when resuming) are ignored. A data type is started
+        when the data types it depends on have finished, whether or not they succeeded. If the function raises an
+        exception for a data type or the process running it exits without a result (e.g., it is killed for running
+        out of memory), it is logged and the other data types continue.
+
+        :param data_types: the data types to run, in order
+        :param func: function taking a data type, which is run in the data type's process. It must return a
+        picklable result.
+        :return: map of data type to result of the function, or None if it failed
+        """
+        pending = list(data_types)
+        # Map of data type to (process, connection on which the process sends the result)
+        running = {}
+        results = {}
+        try:
+            while pending or running:
+                for data_type in self._ready(pending, running)[:self.processes - len(running)]:
+                    pending.remove(data_type)
+                    running[data_type] = self._start(data_type, func)
+                if not running:
+                    raise ValueError("Dependency cycle between %s" % ", ".join(pending))
+                # Wait for a data type to finish, but check for processes that have exited every poll interval.
+                running.itervalues().next()[1].poll(self.poll_interval)
+                for data_type, (process, result_conn) in running.items():
+                    if not result_conn.poll() and process.is_alive():
+                        continue
+                    # The process has sent its result or exited. Once it has exited, receiving does not block.
+                    try:
+                        result = result_conn.recv()
+                    except (EOFError, IOError):
+                        process.join()
+                        warning_log.error("The process loading %s exited with %s.", data_type, process.exitcode)
+                        print "Loading %s failed since its process exited." % data_type
+                        result = None
+                    process.join()
+                    result_conn.close()
+                    del running[data_type]
+                    results[data_type] = result
+        finally:
+            for (process, result_conn) in running.itervalues():
+                process.terminate()
+                process.join()
+        return results
+
+    def _start(self, data_type, func):
+        (result_conn, process_conn) = Pipe(duplex=False)
+        # Daemonic, so that the process is terminated if this process exits and, like a worker in a pool,
+        # does not start processes of its own.
+        process = Process(target=_call, args=(process_conn, func, data_type, self.initializer, self.initargs),
+                          name=data_type)
+        process.daemon = True
+        process.start()
+        # Only the process sends on this end, so that the connection reports EOF if it exits.
+        process_conn.close()
+        return process, result_conn
+
+    def _ready(self, pending, running):
+        """
+        Returns the pending data types whose dependencies have finished.
+        """
+        waiting = set(pending) | set(running)
+        return [data_type for data_type in pending
+                if not any(dependency in waiting for dependency in self.dependencies.get(data_type, ()))]
+
+
+def _call(result_conn, func, data_type, initializer, initargs):
+    # Exceptions are logged in the process, since the traceback does not survive the trip back. BaseExceptions
+    # (e.g., a SystemExit) are included, so that the data type is recorded as failed rather than lost.
+    try:
+        if initializer is not None:
+            initializer(*initargs)
+        result = func(data_type)
+    except BaseException:
+        warning_log.error("Loading %s failed: %s", data_type, traceback.format_exc())
+        print "Loading %s failed." % data_type
+        result = None
+    result_conn.send(result)
+    result_conn.close()
@@ -0,0 +1,113 @@
+"""
+Sharding of xml produced by mysql --xml, so that the rows can be parsed and mapped to triples by several processes.
+
+A file is split into byte ranges on <row> boundaries. Each range is parsed as a document of its own by
+wrapping it in the header of the file (the xml declaration and the <resultset> start tag).
+"""
+from array import array
+from io import BytesIO
+
+import os
+from loader.sink import TripleSink
+
+_row_start = "<row>"
+_resultset_end = "</resultset>"
+_block_size = 1048576
+
+
+def xml_row_ranges(filepath, count):
+    """
+    Splits a file into byte ranges of about the same size on <row> boundaries.
+
+    :param filepath: the file produced by mysql --xml
+    :param count: the number of ranges
+    :return: the header of the file and a list of (start, end) ranges. There are fewer ranges than count for a small
+    file and none for a file without rows.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as xml_file:
+        first_row = _find(xml_file, _row_start, 0)
+        if first_row is None:
+            return None, []
+        xml_file.seek(0)
+        header = xml_file.read(first_row)
+        starts = [first_row]
+        for i in range(1, count):
+            row_start = _find(xml_file, _row_start, max(size * i // count, starts[-1] + 1))
+            if row_start is None:
+                break
+            if row_start > starts[-1]:
+                starts.append(row_start)
+    ends = starts[1:] + [size]
+    return header, zip(starts, ends)
+
+
+def read_xml_range(filepath, header, start, end):
+    """
+    Returns a file object for a byte range of a file, as a document of its own.
+    """
+    with open(filepath, "rb") as xml_file:
+        xml_file.seek(start)
+        body = xml_file.read(end - start)
+    # The last range has the end tag from the file.
+    footer = _resultset_end if end < os.path.getsize(filepath) else ""
+    return BytesIO(header + body + footer)
+
+
+def _find(xml_file, marker, offset):
+    """
+    Returns the position of the first occurrence of a marker at or after an offset or None.
+    """
+    xml_file.seek(offset)
+    position = offset
+    tail = ""
+    while True:
+        block = xml_file.read(_block_size)
+        if not block:
+            return None
+        index = (tail + block).find(marker)
+        if index != -1:
+            return position - len(tail) + index
+        position += len(block)
+        tail = block[-(len(marker) - 1):]
+
+
+class ShardSink(TripleSink):
+    """
+    A sink for the triples of a shard, with each term stored once.
+
+    Triples are kept as term ids so that they can be returned compactly from a worker process.
+    """
+    def __init__(self):
+        self.terms = []
+        self.ids = {}
+        self.triples = array("L")
+
+    def add(self, triple):
+        for term in triple:
+            term_id = self.ids.get(term)
+            if term_id is None:
+                term_id = self.ids[term] = len(self.terms)
+                self.terms.append(term)
+            self.triples.append(term_id)
+
+    def __len__(self):
+        return len(self.triples) // 3
+
+    def decode(self, start, end):
+        """
+        Returns a generator of the triples with indexes from start to end.
+        """
+        terms = self.terms
+        triples = self.triples
+        for i in xrange(start * 3, end * 3, 3):
+            yield terms[triples[i]], terms[triples[i + 1]], terms[triples[i + 2]]
+
+    def __getstate__(self):
+        # The ids can be rebuilt from the terms
+        return {"terms": self.terms, "triples": self.triples}
+
+    def __setstate__(self, state):
+        self.terms = state["terms"]
+        self.triples = state["triples"]
+        self.ids = None
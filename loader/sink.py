@@ -0,0 +1,147 @@
+"""
+Sinks for the triples emitted by entities.
+
+A sink is anything with an add(triple) method. A Graph is a sink that accumulates and indexes the triples.
+"""
+import codecs
+from loader.ntriples import triple_to_nt
+
+
+class TripleSink:
+    """
+    Base for sinks that are not Graphs.
+
+    Like a Graph, triples can be added with +=.
+    """
+    def add(self, triple):
+        raise NotImplementedError
+
+    def __iadd__(self, triples):
+        for triple in triples:
+            self.add(triple)
+        return self
+
+
+class TripleList(list):
+    """
+    A sink that collects the triples in a list, without indexing them.
+    """
+    def add(self, triple):
+        self.append(triple)
+
+
+class BufferedGraphSink(TripleSink):
+    """
+    A sink that adds the triples to a graph in batches with addN.
+    """
+    def __init__(self, g, buffer_size=10000):
+        """
+        :param g: the graph to add to
+        :param buffer_size: number of triples to buffer before adding them to the graph
+        """
+        self.g = g
+        self.buffer_size = buffer_size
+        self.triples = []
+
+    def add(self, triple):
+        self.triples.append(triple)
+        if len(self.triples) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Add the buffered triples to the graph.
+
+        :return: the graph
+        """
+        if self.triples:
+            self.g.addN((s, p, o, self.g) for (s, p, o) in self.triples)
+            self.triples = []
+        return self.g
+
+
+class NTriplesSink(TripleSink):
+    """
+    A sink that writes the triples to a file as N-Triples as they are emitted.
+
+    Duplicate triples are written as many times as they are emitted.
+    """
+    def __init__(self, filepath):
+        """
+        :param filepath: the N-Triples file to write
+        """
+        self.filepath = filepath
+        self.count = 0
+        self.out = codecs.open(filepath, "w", encoding="utf-8")
+
+    def add(self, triple):
+        self.out.write(triple_to_nt(triple))
+        self.count += 1
+
+    def close(self):
+        self.out.close()
+
+
+class TeeSink(TripleSink):
+    """
+    A sink that adds the triples to each of several sinks.
+    """
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def add(self, triple):
+        for sink in self.sinks:
+            sink.add(triple)
+
+
+class RowTriples(TripleList):
+    """
+    A sink for the triples of a row that keeps the shared entities it references apart.
+
+    The triples of a shared entity are built the first time any row references it and are then
+    referenced, rather than built again, by the following rows. Since they are kept with the row
+    (e.g., in the row cache), a row is complete even if the row that first referenced the shared
+    entity is no longer loaded.
+    """
+    def __init__(self, registry):
+        """
+        :param registry: the SharedEntityRegistry
+        """
+        TripleList.__init__(self)
+        self.registry = registry
+        # Map of keys to triples of the shared entities referenced by the row
+        self.shared = {}
+
+    def shared_entity(self, key):
+        """
+        Returns a sink for the triples of a shared entity or None if they have already been built.
+        """
+        if key in self.shared:
+            return None
+        triples = self.registry.get(key)
+        if triples is not None:
+            self.shared[key] = triples
+            return None
+        triples = self.shared[key] = self.registry.put(key, TripleList())
+        return triples
+
+
+class SharedEntityFilter(TripleSink):
+    """
+    A sink that adds the triples of each shared entity to another sink only once.
+    """
+    def __init__(self, sink):
+        """
+        :param sink: the sink to add to
+        """
+        self.sink = sink
+        self.emitted = set()
+
+    def add(self, triple):
+        self.sink.add(triple)
+
+    def shared_entity(self, key):
+        if key in self.emitted:
+            return None
+        self.emitted.add(key)
+        return self.sink
@@ -0,0 +1,119 @@
+"""
+A compact binary format for archived graphs.
+
+A snapshot is a header, a dictionary of the distinct terms in the graph and then
+each triple as three integer ids into the dictionary.  It is written in one sequential pass
+and read with a memory map.
+"""
+import mmap
+import struct
+import sys
+from array import array
+
+import os
+from rdflib import URIRef, Literal, BNode
+
+MAGIC = "VIVOSNAP1\n"
+# Number of terms, number of triples
+_header = struct.Struct("<II")
+# Kind of term, length of value, length of datatype, length of language
+_term_header = struct.Struct("<cIII")
+# Term ids are unsigned 32-bit integers.
+_id_typecode = "I" if array("I").itemsize == 4 else "L"
+
+
+def write_snapshot(triples, filepath):
+    """
+    Write triples to a snapshot file.
+
+    The file is written to a temporary file and then renamed, so an interrupted write does not
+    leave a partial snapshot.
+
+    :param triples: the graph or triples to write
+    :param filepath: the snapshot file
+    :return: the number of triples written
+    """
+    term_ids = {}
+    terms = []
+    ids = array(_id_typecode)
+    for tr in triples:
+        for term in tr:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(terms)
+                terms.append(term)
+            ids.append(term_id)
+    if sys.byteorder != "little":
+        ids.byteswap()
+
+    dirname, filename = os.path.split(filepath)
+    tmp_filepath = os.path.join(dirname, ".%s" % filename)
+    with open(tmp_filepath, "wb") as out:
+        out.write(MAGIC)
+        out.write(_header.pack(len(terms), len(ids) // 3))
+        for term in terms:
+            out.write(_encode_term(term))
+        ids.tofile(out)
+    os.rename(tmp_filepath, filepath)
+    return len(ids) // 3
+
+
+def snapshot_triples(filepath):
+    """
+    Generator for the triples in a snapshot file.
+    """
+    with open(filepath, "rb") as snapshot_file:
+        mm = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if mm[:len(MAGIC)] != MAGIC:
+                raise ValueError("%s is not a snapshot" % filepath)
+            offset = len(MAGIC)
+            term_count, triple_count = _header.unpack_from(mm, offset)
+            offset += _header.size
+
+            terms = []
+            for _ in xrange(term_count):
+                kind, value_len, datatype_len, language_len = _term_header.unpack_from(mm, offset)
+                offset += _term_header.size
+                value = mm[offset:offset + value_len].decode("utf-8")
+                offset += value_len
+                datatype = mm[offset:offset + datatype_len].decode("utf-8")
+                offset += datatype_len
+                language = mm[offset:offset + language_len]
+                offset += language_len
+                terms.append(_decode_term(kind, value, datatype, language))
+
+            ids = array(_id_typecode)
+            ids.fromstring(mm[offset:offset + triple_count * 3 * ids.itemsize])
+        finally:
+            mm.close()
+    if sys.byteorder != "little":
+        ids.byteswap()
+
+    for i in xrange(0, len(ids), 3):
+        yield terms[ids[i]], terms[ids[i + 1]], terms[ids[i + 2]]
+
+
+def _encode_term(term):
+    value = unicode(term).encode("utf-8")
+    datatype = ""
+    language = ""
+    if isinstance(term, URIRef):
+        kind = "U"
+    elif isinstance(term, Literal):
+        kind = "L"
+        datatype = unicode(term.datatype or "").encode("utf-8")
+        language = str(term.language or "")
+    elif isinstance(term, BNode):
+        kind = "B"
+    else:
+        raise ValueError("Cannot write %r to a snapshot" % (term,))
+    return _term_header.pack(kind, len(value), len(datatype), len(language)) + value + datatype + language
+
+
+def _decode_term(kind, value, datatype, language):
+    if kind == "U":
+        return URIRef(value)
+    if kind == "L":
+        return Literal(value, lang=language or None, datatype=URIRef(datatype) if datatype else None)
+    return BNode(value)
@@ -2,12 +2,20 @@ from __future__ import division
 
 import math
 import socket
+import tempfile
 import time
+import urllib
+import Queue
+from multiprocessing.pool import ThreadPool
 
 import codecs
 import os
-from SPARQLWrapper import SPARQLWrapper
+import requests
+from requests.adapters import HTTPAdapter
 from loader.namespace import ns_manager
+from loader.ntriples import ntriples_generator, write_ntriples, triple_size
+from loader.sink import TripleSink
+from loader.utility import warning_log
 from rdflib import Graph
 
 
@@ -29,8 +37,10 @@ def serialize(graph, filepath, prefix, suffix=None, split_size=None):
         print "Splitting %s triples into %s parts." % (len(graph), split_num)
         split_count = 0
         filenames = []
-        for graph_part in graph_split_generator(graph, split_size):
+        for triples in graph_split_generator(graph, split_size):
             split_count += 1
+            graph_part = Graph(namespace_manager=ns_manager)
+            graph_part += triples
             filenames.append(_serialize(graph_part, filepath, prefix, split_count))
         return filenames
     else:
@@ -45,130 +55,489 @@ def _serialize(graph, filepath, prefix, suffix=None):
     return filename
 
 
-def load_previous_graph(graph_dir, prefix):
-    """
-    Find the most recent graph with the provided prefix.
-
-    :param graph_dir: the directory containing the graph files
-    :param prefix: prefix for the filename
-    :return: the most recent graph or an empty graph
-    """
-    #Find the most recent graph with the prefix
-    filenames = [f for f in os.listdir(graph_dir) if f.startswith(prefix + "-")]
-    g = Graph(namespace_manager=ns_manager)
-    if filenames:
-        filenames.sort(reverse=True)
-        print "Loading existing graph %s for %s in %s" % (filenames[0], prefix, graph_dir)
-        g.parse(os.path.join(graph_dir, filenames[0]), format="turtle")
-    else:
-        print "No existing graphs for %s in %s" % (prefix, graph_dir)
-    return g
+def _serialize_ntriples(triples, filepath, prefix, suffix=None):
+    # The file is created with a unique name, since several processes (e.g., with --processes) can write splits
+    # to the same directory in the same second.
+    (fd, tmp_filepath) = tempfile.mkstemp(dir=filepath, suffix=".nt",
+                                          prefix="%s-%s%s-" % (prefix, time.strftime("%Y%m%d%H%M%S"),
+                                                               "-" + str(suffix) if suffix else ""))
+    os.close(fd)
+    # Readable by the web server
+    os.chmod(tmp_filepath, 0644)
+    filename = os.path.basename(tmp_filepath)
+    print "Writing %s triples to %s" % (len(triples), filename)
+    write_ntriples(triples, tmp_filepath)
+    return filename
 
 
-def sparql_load(graph, htdocs_dir, endpoint, username, password, split_size=None):
+def sparql_load(graph, htdocs_dir, endpoint, split_size=None, concurrency=1, split_bytes=None,
+                journal=None, retries=0, retry_backoff=5):
     """
     Perform a SPARQL LOAD of the supplied graph.
 
-    To perform a LOAD, the serialized graph is retrieved by the SPARQL server.
+    To perform a LOAD, the graph is serialized as N-Triples and retrieved by the SPARQL server.
     Thus, a web server needs to be available to serve the serialized graph.
 
-    If a split size is set, the load may be split into multiple SPARQL LOAD calls.
+    If a split size or split bytes is set, the load may be split into multiple SPARQL LOAD calls.
+    Up to concurrency LOAD calls are made at the same time.
 
-    :param graph: the graph to load
+    :param graph: the graph or set of triples to load
     :param htdocs_dir: the directory from which the web server will serve
-    :param endpoint: the URL for SPARQL Update on the SPARQL server
-    :param username: username for SPARQL Update
-    :param password: password for SPARQL Update
-    :param split_size: maximum number of triples to include in a call
+    :param endpoint: the SparqlEndpoint to perform SPARQL Update with
+    :param split_size: maximum number of triples to include in a call or an AdaptiveSplitSize
+    :param concurrency: maximum number of LOAD calls to make at the same time
+    :param split_bytes: maximum size in bytes of the N-Triples to include in a call
+    :param journal: ChunkJournal in which to record acknowledged splits
+    :param retries: number of times to retry a failed call
+    :param retry_backoff: seconds to wait before the first retry, doubling for each further retry
+    :return: True if all of the splits were loaded
     """
-    filenames = serialize(graph, htdocs_dir, "load", split_size=split_size)
-    ip = socket.gethostbyname(socket.gethostname())
-    for filename in filenames:
-        print "Loading %s" % filename
-        sparql_update("""
-            LOAD <http://%s/%s> into graph <http://vitro.mannlib.cornell.edu/default/vitro-kb-2>
-        """ % (ip, filename), endpoint, username, password)
+    runner = SplitRunner(_load_file_func(endpoint), concurrency=concurrency, split_size=split_size,
+                         on_success=journal.record_added if journal else None,
+                         retries=retries, retry_backoff=retry_backoff)
+    for split_count, graph_part in enumerate(_split(graph, split_size, split_bytes, "loading"), start=1):
+        filename = _serialize_ntriples(graph_part, htdocs_dir, "load",
+                                       split_count if split_size or split_bytes else None)
+        runner.submit("Loading %s" % filename, filename, graph_part)
+    return runner.close()
 
 
-def sparql_delete(graph, endpoint, username, password, split_size=None):
+def sparql_insert(graph, endpoint, split_size=None, concurrency=1, split_bytes=None,
+                  journal=None, retries=0, retry_backoff=5):
+    """
+    Perform a SPARQL INSERT DATA of the supplied graph.
+
+    Unlike a LOAD, the triples are streamed to the SPARQL server in the body of the request,
+    so no web server is required.
+
+    If a split size or split bytes is set, the insert may be split into multiple SPARQL INSERT DATA calls.
+    Up to concurrency INSERT DATA calls are made at the same time.
+
+    :param graph: the graph or set of triples to insert
+    :param endpoint: the SparqlEndpoint to perform SPARQL Update with
+    :param split_size: maximum number of triples to include in a call or an AdaptiveSplitSize
+    :param concurrency: maximum number of INSERT DATA calls to make at the same time
+    :param split_bytes: maximum size in bytes of the N-Triples to include in a call
+    :param journal: ChunkJournal in which to record acknowledged splits
+    :param retries: number of times to retry a failed call
+    :param retry_backoff: seconds to wait before the first retry, doubling for each further retry
+    :return: True if all of the splits were inserted
+    """
+    runner = SplitRunner(_insert_func(endpoint), concurrency=concurrency, split_size=split_size,
+                         on_success=journal.record_added if journal else None,
+                         retries=retries, retry_backoff=retry_backoff)
+    for graph_part in _split(graph, split_size, split_bytes, "inserting"):
+        runner.submit("Inserting %s triples" % len(graph_part), graph_part, graph_part)
+    return runner.close()
+
+
+def sparql_delete(graph, endpoint, split_size=None, concurrency=1, split_bytes=None,
+                  journal=None, retries=0, retry_backoff=5):
     """
     Perform a SPARQL DELETE of the supplied graph.
 
-    If a split size is set, the load may be split into multiple SPARQL DELETE calls.
+    If a split size or split bytes is set, the delete may be split into multiple SPARQL DELETE calls.
+    Up to concurrency DELETE calls are made at the same time.
 
-    :param graph: the graph to delete
-    :param endpoint: the URL for SPARQL Update on the SPARQL server
-    :param username: username for SPARQL Update
-    :param password: password for SPARQL Update
-    :param split_size: maximum number of triples to include in a call
+    :param graph: the graph or set of triples to delete
+    :param endpoint: the SparqlEndpoint to perform SPARQL Update with
+    :param split_size: maximum number of triples to include in a call or an AdaptiveSplitSize
+    :param concurrency: maximum number of DELETE calls to make at the same time
+    :param split_bytes: maximum size in bytes of the N-Triples to include in a call
+    :param journal: ChunkJournal in which to record acknowledged splits
+    :param retries: number of times to retry a failed call
+    :param retry_backoff: seconds to wait before the first retry, doubling for each further retry
+    :return: True if all of the splits were deleted
     """
-    if split_size:
-        split_num = int(math.ceil(len(graph) / split_size))
-        print "Splitting %s triples into %s parts for deleting." % (len(graph), split_num)
-        for graph_part in graph_split_generator(graph, split_size):
-            print "Deleting %s triples." % len(graph_part)
-            _sparql_delete(graph_part, endpoint, username, password)
+    def delete_graph(g):
+        _sparql_delete(g, endpoint)
+
+    runner = SplitRunner(delete_graph, concurrency=concurrency, split_size=split_size,
+                         on_success=journal.record_deleted if journal else None,
+                         retries=retries, retry_backoff=retry_backoff)
+    for graph_part in _split(graph, split_size, split_bytes, "deleting"):
+        runner.submit("Deleting %s triples" % len(graph_part), graph_part, graph_part)
+    return runner.close()
+
+
+class SparqlLoadSink(TripleSink):
+    """
+    A sink that loads triples into the SPARQL server as they are emitted.
+
+    Triples are collected into splits, which are sent by SPARQL LOAD or, if there is no htdocs directory,
+    SPARQL INSERT DATA as soon as they are full. Submitting a split waits while concurrency calls are in flight,
+    so at most concurrency + 1 splits are held in memory, however many triples are emitted.
+
+    Duplicate triples within a split are sent once. Duplicates in different splits are sent again, which
+    does not change the SPARQL server's graph.
+    """
+    def __init__(self, endpoint, htdocs_dir=None, split_size=10000, split_bytes=None, concurrency=1,
+                 journal=None, retries=0, retry_backoff=5):
+        """
+        :param endpoint: the SparqlEndpoint to perform SPARQL Update with
+        :param htdocs_dir: the directory from which the web server will serve for a LOAD or None to INSERT DATA
+        :param split_size: maximum number of triples to include in a call or an AdaptiveSplitSize
+        :param split_bytes: maximum size in bytes of the N-Triples to include in a call
+        :param concurrency: maximum number of calls to make at the same time
+        :param journal: ChunkJournal in which to record acknowledged splits
+        :param retries: number of times to retry a failed call
+        :param retry_backoff: seconds to wait before the first retry, doubling for each further retry
+        """
+        self.htdocs_dir = htdocs_dir
+        self.split_size = split_size
+        self.split_bytes = split_bytes
+        self.runner = SplitRunner(_load_file_func(endpoint) if htdocs_dir else _insert_func(endpoint),
+                                  concurrency=concurrency, split_size=split_size,
+                                  on_success=journal.record_added if journal else None,
+                                  retries=retries, retry_backoff=retry_backoff)
+        self.triples = set()
+        self.triples_bytes = 0
+        self.split_count = 0
+        self.count = 0
+
+    def add(self, triple):
+        if triple in self.triples:
+            return
+        if self.split_bytes:
+            tr_bytes = triple_size(triple)
+            if self.triples and self.triples_bytes + tr_bytes > self.split_bytes:
+                self._submit()
+            self.triples_bytes += tr_bytes
+        self.triples.add(triple)
+        # A split size of 0 or None limits only by split bytes, as for _split.
+        if self.split_size and len(self.triples) >= int(self.split_size):
+            self._submit()
+
+    def close(self):
+        """
+        Send the last split and wait for all of the splits to complete.
+
+        :return: True if all of the splits were loaded
+        """
+        if self.triples:
+            self._submit()
+        print "Sent %s triples in %s splits." % (self.count, self.split_count)
+        return self.runner.close()
+
+    def _submit(self):
+        triples = list(self.triples)
+        self.triples = set()
+        self.triples_bytes = 0
+        self.split_count += 1
+        self.count += len(triples)
+        print "%s (%s triples sent):" % (self.split_count, self.count),
+        if self.htdocs_dir:
+            filename = _serialize_ntriples(triples, self.htdocs_dir, "load", self.split_count)
+            self.runner.submit("Loading %s" % filename, filename, triples)
+        else:
+            self.runner.submit("Inserting %s triples" % len(triples), triples, triples)
+
+
+def _load_file_func(endpoint):
+    ip = socket.gethostbyname(socket.gethostname())
+
+    def load_file(filename):
+        endpoint.update("""
+            LOAD <http://%s/%s> into graph <http://vitro.mannlib.cornell.edu/default/vitro-kb-2>
+        """ % (ip, filename))
+    return load_file
+
+
+def _insert_func(endpoint):
+    def insert_graph(g):
+        endpoint.update(_data_query_generator("INSERT", g))
+    return insert_graph
+
+
+def _split(graph, split_size, split_bytes, action):
+    if split_size or split_bytes:
+        if isinstance(split_size, AdaptiveSplitSize):
+            print "Splitting %s triples into parts of %s to %s triples for %s." % (
+                len(graph), split_size.min_size, split_size.max_size, action)
+        elif split_size:
+            split_num = int(math.ceil(len(graph) / split_size))
+            print "Splitting %s triples into %s parts for %s." % (len(graph), split_num, action)
+        if split_bytes:
+            print "Limiting parts to %s bytes." % split_bytes
+        for graph_part in graph_split_generator(graph, split_size, split_bytes=split_bytes):
+            yield graph_part
     else:
-        print "Deleting %s triples." % len(graph)
-        _sparql_delete(graph, endpoint, username, password)
-
-
-def _sparql_delete(g, endpoint, username, password):
-    #Need to construct query
-    ns_lines = []
-    triple_lines = []
-    for line in g.serialize(format="turtle").splitlines():
-        if line.startswith("@prefix"):
-            #Change from @prefix to PREFIX
-            ns_lines.append("PREFIX" + line[7:-2])
+        yield graph
+
+
+def _data_query_generator(operation, g):
+    """
+    Generator for the parts of an INSERT DATA or DELETE DATA query.
+
+    Triples are written as N-Triples, so that the query is never built as one big string.
+    """
+    yield "%s DATA { GRAPH <http://vitro.mannlib.cornell.edu/default/vitro-kb-2> {\n" % operation
+    for chunk in ntriples_generator(g):
+        yield chunk
+    yield "}}"
+
+
+class AdaptiveSplitSize:
+    """
+    A split size that is adjusted based on how long SPARQL Update calls take.
+
+    A split that is full and completes in under half of the target latency grows the size.
+    A split that takes longer than the target latency shrinks the size in proportion.
+    A failed split halves the size. The size is kept within the configured bounds.
+    """
+    def __init__(self, min_size, max_size, size=None, target_latency=60):
+        """
+        :param min_size: smallest number of triples to include in a call
+        :param max_size: largest number of triples to include in a call
+        :param size: initial number of triples to include in a call. Default is min_size.
+        :param target_latency: seconds that a call should take
+        """
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min(size or min_size, max_size), min_size)
+        self.target_latency = target_latency
+
+    def record(self, triple_count, elapsed, failed=False):
+        """
+        Adjust the size based on a completed call.
+
+        :param triple_count: number of triples in the split
+        :param elapsed: seconds the call took
+        :param failed: True if the call failed
+        """
+        if failed:
+            new_size = self.size // 2
+        elif elapsed > self.target_latency:
+            new_size = min(self.size, int(triple_count * self.target_latency / elapsed))
+        elif elapsed < self.target_latency / 2 and triple_count >= self.size:
+            new_size = int(self.size * 1.5)
+        else:
+            return
+        new_size = max(min(new_size, self.max_size), self.min_size)
+        if new_size != self.size:
+            print "Changing split size from %s to %s triples after %s triples %s in %.2f seconds." % (
+                self.size, new_size, triple_count, "failed" if failed else "completed", elapsed)
+            self.size = new_size
+
+    def __int__(self):
+        return self.size
+
+
+class SplitRunner:
+    """
+    Performs SPARQL Update calls for splits using a bounded pool of worker threads.
+
+    At most concurrency calls are in flight at once. A failed call is retried with backoff and,
+    if it still fails, logged and recorded, but does not stop the remaining splits. The time taken
+    by each call is reported and, if the split size is an AdaptiveSplitSize, used to adjust it.
+    """
+    def __init__(self, func, concurrency=1, split_size=None, on_success=None, retries=0, retry_backoff=5):
+        """
+        :param func: function to call with each split
+        :param concurrency: maximum number of calls to make at the same time
+        :param split_size: the split size, which is adjusted if it is an AdaptiveSplitSize
+        :param on_success: function to call with the triples of each split that succeeded
+        :param retries: number of times to retry a failed call
+        :param retry_backoff: seconds to wait before the first retry, doubling for each further retry
+        """
+        self.func = func
+        self.concurrency = max(concurrency or 1, 1)
+        self.split_size = split_size
+        self.on_success = on_success
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.pool = ThreadPool(self.concurrency)
+        self.results = Queue.Queue()
+        self.pending = 0
+        self.timings = []
+        self.failed = []
+        self.start_time = time.time()
+
+    def submit(self, name, split, triples=None):
+        """
+        Queue a split, waiting for a worker if all are busy.
+
+        :param name: description of the split for reporting
+        :param split: the argument to pass to func
+        :param triples: the triples in the split
+        """
+        while self.pending >= self.concurrency:
+            self._collect()
+        self.pool.apply_async(_timed_call, (self.func, name, split, triples, self.retries, self.retry_backoff),
+                              callback=self.results.put)
+        self.pending += 1
+
+    def close(self):
+        """
+        Wait for all queued splits to complete and report.
+
+        :return: True if no split failed
+        """
+        while self.pending:
+            self._collect()
+        self.pool.close()
+        self.pool.join()
+        if self.timings:
+            print "%s of %s splits succeeded in %.2f seconds (mean %.2f, max %.2f seconds per split)." % (
+                len(self.timings), len(self.timings) + len(self.failed), time.time() - self.start_time,
+                sum(self.timings) / len(self.timings), max(self.timings))
+        if self.failed:
+            print "%s splits failed." % len(self.failed)
+        return not self.failed
+
+    def _collect(self):
+        name, triples, elapsed, error = self.results.get()
+        self.pending -= 1
+        if error is None:
+            self.timings.append(elapsed)
+            print "%s took %.2f seconds." % (name, elapsed)
+            if self.on_success and triples is not None:
+                self.on_success(triples)
         else:
-            triple_lines.append(line)
-    query = "\n".join(ns_lines)
-    query += "\nDELETE DATA { GRAPH <http://vitro.mannlib.cornell.edu/default/vitro-kb-2> {\n"
-    query += "\n".join(triple_lines)
-    query += "\n}}"
-    sparql_update(query, endpoint, username, password)
+            self.failed.append(name)
+            print "%s failed after %.2f seconds: %s" % (name, elapsed, error)
+            warning_log.error("%s failed: %s", name, error)
+        if isinstance(self.split_size, AdaptiveSplitSize) and triples:
+            self.split_size.record(len(triples), elapsed, failed=error is not None)
+
+
+def _timed_call(func, name, split, triples, retries, retry_backoff):
+    attempt = 0
+    while True:
+        start_time = time.time()
+        try:
+            func(split)
+            return name, triples, time.time() - start_time, None
+        except Exception, e:
+            if attempt >= retries:
+                return name, triples, time.time() - start_time, e
+            wait = retry_backoff * 2 ** attempt
+            print "%s failed: %s. Retrying in %s seconds." % (name, e, wait)
+            time.sleep(wait)
+            attempt += 1
+
+
+def _sparql_delete(g, endpoint):
+    endpoint.update(_data_query_generator("DELETE", g))
 
 
 def sparql_update(query, endpoint, username, password):
     """
-    Perform a SPARQL Update query.
+    Perform a single SPARQL Update query.
+
+    To perform many queries, use a SparqlEndpoint instead.
 
     :param query: the query to perform
     :param endpoint: the URL for SPARQL Update on the SPARQL server
     :param username: username for SPARQL Update
     :param password: password for SPARQL Update
     """
-    sparql = SPARQLWrapper(endpoint)
-    sparql.addParameter("email", username)
-    sparql.addParameter("password", password)
-    sparql.setQuery(query)
-    sparql.setMethod("POST")
-    sparql.query()
+    SparqlEndpoint(endpoint, username, password).update(query)
+
 
+class SparqlEndpoint:
+    """
+    A long-lived client for performing SPARQL Update queries.
 
-def graph_split_generator(graph, split_size):
+    Connections are pooled and kept alive between queries and the credentials
+    are encoded once, so a run should create one and share it.
+    """
+    def __init__(self, endpoint, username, password, pool_size=10, timeout=None, slots=None):
+        """
+        :param endpoint: the URL for SPARQL Update on the SPARQL server
+        :param username: username for SPARQL Update
+        :param password: password for SPARQL Update
+        :param pool_size: maximum number of connections to keep open. Should be at least the number of
+        threads performing queries.
+        :param timeout: seconds to wait for the SPARQL server to respond
+        :param slots: a semaphore (e.g., a multiprocessing.BoundedSemaphore) bounding the number of queries
+        performed at once by all of the clients sharing it. None for no bound.
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.slots = slots
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/x-www-form-urlencoded"
+        self._credentials = urllib.urlencode((("email", username), ("password", password)))
+
+    def update(self, query):
+        """
+        Perform a SPARQL Update query.
+
+        :param query: the query to perform, either as a string or as an iterable of strings.
+        An iterable is streamed to the SPARQL server using chunked transfer encoding.
+        """
+        if isinstance(query, basestring):
+            data = "%s&update=%s" % (self._credentials, _quote(query))
+        else:
+            data = self._stream(query)
+        if self.slots is None:
+            response = self.session.post(self.endpoint, data=data, timeout=self.timeout)
+        else:
+            with self.slots:
+                response = self.session.post(self.endpoint, data=data, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+    def _stream(self, query_parts):
+        yield self._credentials + "&update="
+        for query_part in query_parts:
+            yield _quote(query_part)
+
+
+def _quote(query):
+    if isinstance(query, unicode):
+        query = query.encode("utf-8")
+    return urllib.quote_plus(query)
+
+
+def graph_split_generator(graph, split_size, split_bytes=None):
     """
     Generator for splitting graph into multiple parts.
 
+    A split ends when it reaches either limit.
+
     :param graph:  the graph to split
-    :param split_size: maximum number of triples to include in each split
-    :return: the next graph containing part of the source graph
+    :param split_size: maximum number of triples to include in each split. If an AdaptiveSplitSize,
+    its current size is used for each split. If None, only split_bytes is used.
+    :param split_bytes: maximum size in bytes of the N-Triples for each split. A single triple that is
+    larger than this is put in a split by itself.
+    :return: the next list of triples containing part of the source graph
     """
-    split_num = int(math.ceil(len(graph) / split_size))
-    split_count = 0
+    total = len(graph)
     tr_count = 0
-    graph_part = Graph(namespace_manager=ns_manager)
+    split_count = 0
+    size = int(split_size) if split_size else None
+    triples = []
+    triples_bytes = 0
     for tr in graph:
-        graph_part.add(tr)
-        tr_count += 1
-        if tr_count == split_size:
+        if split_bytes:
+            tr_bytes = triple_size(tr)
+            if triples and triples_bytes + tr_bytes > split_bytes:
+                split_count += 1
+                tr_count += len(triples)
+                print "%s (%s of %s triples):" % (split_count, tr_count, total),
+                yield triples
+                triples = []
+                triples_bytes = 0
+                size = int(split_size) if split_size else None
+            triples_bytes += tr_bytes
+        triples.append(tr)
+        if size and len(triples) >= size:
             split_count += 1
-            print "%s of %s:" % (split_count, split_num),
-            yield graph_part
-            tr_count = 0
-            graph_part = Graph(namespace_manager=ns_manager)
-    if len(graph_part) > 0:
+            tr_count += len(triples)
+            print "%s (%s of %s triples):" % (split_count, tr_count, total),
+            yield triples
+            triples = []
+            triples_bytes = 0
+            size = int(split_size)
+    if triples:
         split_count += 1
-        print "%s of %s:" % (split_count, split_num),
-        yield graph_part
+        tr_count += len(triples)
+        print "%s (%s of %s triples):" % (split_count, tr_count, total),
+        yield triples
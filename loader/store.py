@@ -0,0 +1,141 @@
+"""
+A compact in-memory store for the graphs generated by the loaders.
+
+rdflib's default memory store keeps three nested dict indexes of terms. This store interns each term once
+in a table and keeps, for each subject, the predicate and object ids of its triples packed into 64-bit
+integers in an array. Only lookups by subject are indexed. Other patterns scan the store, which is what
+iterating, diffing and serializing a graph do anyway.
+"""
+from array import array
+
+from loader.namespace import ns_manager
+from rdflib import Graph
+from rdflib.store import Store
+
+# Predicate and object ids are packed into a single unsigned 64-bit integer.
+_typecode = "L"
+_object_bits = 32
+_object_mask = (1 << _object_bits) - 1
+# Subjects with more triples than this use a set rather than an array, so that adding a triple stays fast.
+_max_array_len = 32 if array(_typecode).itemsize >= 8 else 0
+
+
+class CompactStore(Store):
+    """
+    A compact, non-context-aware in-memory store.
+
+    Events are not dispatched when triples are added or removed.
+    """
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        Store.__init__(self, configuration=configuration, identifier=identifier)
+        self.identifier = identifier
+        # Term to id
+        self._ids = {}
+        # Id to term
+        self._terms = []
+        # Subject id to array (or set) of packed predicate and object ids
+        self._spo = {}
+        self._count = 0
+        self._namespace = {}
+        self._prefix = {}
+
+    def add(self, triple, context, quoted=False):
+        (s, p, o) = triple
+        s_id = self._intern(s)
+        po = self._intern(p) << _object_bits | self._intern(o)
+        pos = self._spo.get(s_id)
+        if pos is None:
+            self._spo[s_id] = array(_typecode, (po,)) if _max_array_len else {po}
+        elif po in pos:
+            return
+        elif isinstance(pos, set):
+            pos.add(po)
+        elif len(pos) >= _max_array_len:
+            pos = self._spo[s_id] = set(pos)
+            pos.add(po)
+        else:
+            pos.append(po)
+        self._count += 1
+
+    def remove(self, triple_pattern, context=None):
+        for (s, p, o), contexts in list(self.triples(triple_pattern)):
+            s_id = self._ids[s]
+            pos = self._spo[s_id]
+            pos.remove(self._ids[p] << _object_bits | self._ids[o])
+            if not pos:
+                del self._spo[s_id]
+            self._count -= 1
+
+    def triples(self, triple_pattern, context=None):
+        (s, p, o) = triple_pattern
+        p_id = None
+        o_id = None
+        if p is not None:
+            p_id = self._ids.get(p)
+            if p_id is None:
+                return
+        if o is not None:
+            o_id = self._ids.get(o)
+            if o_id is None:
+                return
+        if s is not None:
+            s_id = self._ids.get(s)
+            if s_id is None or s_id not in self._spo:
+                return
+            subjects = ((s_id, self._spo[s_id]),)
+        else:
+            subjects = self._spo.iteritems()
+
+        terms = self._terms
+        if p_id is not None and o_id is not None:
+            po = p_id << _object_bits | o_id
+            for s_id, pos in subjects:
+                if po in pos:
+                    yield (terms[s_id], terms[p_id], terms[o_id]), iter(())
+        else:
+            for s_id, pos in subjects:
+                for po in pos:
+                    if p_id is not None and po >> _object_bits != p_id:
+                        continue
+                    if o_id is not None and po & _object_mask != o_id:
+                        continue
+                    yield (terms[s_id], terms[po >> _object_bits], terms[po & _object_mask]), iter(())
+
+    def __len__(self, context=None):
+        return self._count
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace):
+        self._prefix[namespace] = prefix
+        self._namespace[prefix] = namespace
+
+    def namespace(self, prefix):
+        return self._namespace.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefix.get(namespace)
+
+    def namespaces(self):
+        for prefix, namespace in self._namespace.iteritems():
+            yield prefix, namespace
+
+    def _intern(self, term):
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+
+def compact_graph():
+    """
+    Returns a new, empty graph backed by a CompactStore.
+    """
+    return Graph(store=CompactStore(), namespace_manager=ns_manager)
@@ -2,14 +2,19 @@ import csv
 import hashlib
 import inspect
 import logging
+from collections import Counter, OrderedDict
+from itertools import izip
 from numbers import Number
 
 from namespace import *
 
-import codecs
 import os
 import petl as etl
 import re
+import unicodecsv
+from loader.columns import column_cache, project
+from loader.entity import shared_entity_sink
+from loader.gwids import GwidSet, gwid_set
 from loader.prefixes import PREFIX_LANGUAGE, PREFIX_MULTIMEDIA
 from lxml import etree
 from petl.util.base import Table
@@ -46,10 +51,89 @@ def join_if_not_empty(items, sep=" "):
     return joined
 
 
+class IdentifierCache:
+    """
+    A bounded memo of hash identifiers and URIs.
+
+    The cache keeps two generations. When the current generation is full, it becomes the previous generation
+    and the old previous generation is dropped. Values found in the previous generation are moved to the
+    current generation, so frequently used values, e.g., the URI for GWU, stay cached.
+    """
+    def __init__(self, max_size=100000):
+        """
+        :param max_size: maximum number of values in each generation
+        """
+        self.max_size = max_size
+        self.current = {}
+        self.previous = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the cached value or None.
+        """
+        value = self.current.get(key)
+        if value is None:
+            value = self.previous.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.put(key, value)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if len(self.current) >= self.max_size:
+            self.previous = self.current
+            self.current = {}
+        self.current[key] = value
+
+    def clear(self):
+        self.current = {}
+        self.previous = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.current) + len(self.previous)
+
+# The identifier cache shared by all of the data types loaded in a run.
+identifier_cache = IdentifierCache()
+
+
 def to_hash_identifier(prefix, parts):
     """
     Return an identifier composed of the prefix and hash of the parts.
     """
+    try:
+        key = (prefix, tuple(parts))
+        identifier = identifier_cache.get(key)
+    except TypeError:
+        # Parts that are not hashable are not cached.
+        return _to_hash_identifier(prefix, parts)
+    if identifier is None:
+        identifier = _to_hash_identifier(prefix, parts)
+        identifier_cache.put(key, identifier)
+    return identifier
+
+
+def to_hash_uri(prefix, parts):
+    """
+    Return the URI for the identifier composed of the prefix and hash of the parts.
+    """
+    try:
+        key = ("uri", prefix, tuple(parts))
+        uri = identifier_cache.get(key)
+    except TypeError:
+        return D[_to_hash_identifier(prefix, parts)]
+    if uri is None:
+        uri = D[to_hash_identifier(prefix, parts)]
+        identifier_cache.put(key, uri)
+    return uri
+
+
+def _to_hash_identifier(prefix, parts):
     hash_parts = hashlib.md5("".join([unicode(part) for part in parts if part]).encode("utf-8"))
     return "%s-%s" % (prefix, hash_parts.hexdigest())
 
@@ -194,9 +278,11 @@ language_map = {
 
 
 def add_language(language, person_uri, g):
-    language_uri = D[to_hash_identifier(PREFIX_LANGUAGE, (language,))]
-    g.add((language_uri, RDF.type, LINKVOJ.Lingvo))
-    g.add((language_uri, RDFS.label, Literal(language)))
+    language_uri = to_hash_uri(PREFIX_LANGUAGE, (language,))
+    shared_g = shared_entity_sink(g, (language_uri, language))
+    if shared_g is not None:
+        shared_g.add((language_uri, RDF.type, LINKVOJ.Lingvo))
+        shared_g.add((language_uri, RDFS.label, Literal(language)))
     g.add((person_uri, LINKVOJ.expertUnderstanding, language_uri))
 
 
@@ -205,7 +291,7 @@ def add_multimedia(multimedia, person_uri, multimedia_predicate, g):
         multimedia += ","
     for multimedia_string in re.findall(r".\|.+?\|.+?,", multimedia):
         (multimedia_type, multimedia_label, multimedia_url) = multimedia_string[:-1].split("|")
-        multimedia_uri = D[to_hash_identifier(PREFIX_MULTIMEDIA, multimedia_url)]
+        multimedia_uri = to_hash_uri(PREFIX_MULTIMEDIA, multimedia_url)
         if multimedia_type == "A":
             multimedia_class = BIBO.AudioDocument
         elif multimedia_type == "O":
@@ -224,23 +310,103 @@ def strip_gw_prefix(string):
     return string
 
 
-def xml_result_generator(filepath):
+def xml_result_generator(filepath, fields=None):
     """
     Returns a generator that provides maps of field names to values read from
     xml produced by mysql --xml.
+
+    A file path is read through the column cache.
+
+    :param filepath: the file path or a file object
+    :param fields: the field names to read or None for all
+    """
+    rows = xml_table(filepath, fields)
+    field_names = next(rows)
+    for row in rows:
+        yield dict(izip(field_names, row))
+
+
+def xml_table(source, fields=None):
+    """
+    Returns a generator of the rows of xml produced by mysql --xml, starting with the field names.
+
+    :param source: the file path, which is read through the column cache, or a file object
+    :param fields: the field names to read or None for all
+    """
+    if isinstance(source, basestring):
+        return column_cache.rows(source, xml_rows, fields)
+    return project(xml_rows(source), fields)
+
+
+def xml_rows(source):
+    """
+    Returns a generator of the rows of xml produced by mysql --xml as lists of values, starting with the field names.
+    """
+    yielded_field_names = False
+    for row in xml_row_generator(source):
+        if not yielded_field_names:
+            yield [field_name for (field_name, value) in row]
+            yielded_field_names = True
+        yield [value for (field_name, value) in row]
+
+
+def xml_row_generator(source):
+    """
+    Returns a generator that provides the rows of xml produced by mysql --xml as lists of
+    (field name, value).
+
+    Memory use is constant, since each row is removed from the tree once it has been read.
+    Nil or empty values are None. Other values are stripped of whitespace.
+
+    :param source: the file path or a file object
     """
     # Using lxml because recover=True makes it tolerant of unicode encoding problems.
-    for event, row_elem in etree.iterparse(filepath, tag="row", recover=True):
-        result = {}
-        for field_elem in row_elem.iter("field"):
-            if "xsi:nil" in field_elem.attrib or not field_elem.text:
-                value = None
-            else:
-                # Strip whitespace
-                value = field_elem.text.strip()
-            result[field_elem.get("name")] = value
+    for event, row_elem in etree.iterparse(source, tag="row", recover=True):
+        row = [(field_elem.get("name"), field_elem.text.strip() if field_elem.text else None)
+               for field_elem in row_elem.iterchildren("field")]
+        # Clearing the row leaves an empty element in the root, so also remove it and any rows before it.
         row_elem.clear()
-        yield result
+        while row_elem.getprevious() is not None:
+            del row_elem.getparent()[0]
+        yield row
+
+
+def banner_result_generator(filepath, fields=None):
+    """
+    Returns a generator that provides maps of field names to values read from
+    a Banner export, read through the column cache.
+
+    Values are unicode.
+
+    :param filepath: the file path
+    :param fields: the field names to read or None for all
+    """
+    rows = banner_table(filepath, fields)
+    field_names = next(rows)
+    for row in rows:
+        yield dict(izip(field_names, row))
+
+
+def banner_table(filepath, fields=None):
+    """
+    Returns a generator of the rows of a Banner export, starting with the field names.
+
+    :param filepath: the file path, which is read through the column cache
+    :param fields: the field names to read or None for all
+    """
+    return column_cache.rows(filepath, banner_rows, fields)
+
+
+def banner_rows(filepath):
+    """
+    Returns a generator of the rows of a Banner export as lists of values, starting with the field names.
+
+    Like a csv.DictReader, empty lines are skipped.
+    """
+    with open(filepath, "rb") as csv_file:
+        for row in unicodecsv.reader(csv_file, dialect="banner"):
+            if row:
+                yield row
 
 
 def remove_extra_args(func_args, func):
@@ -297,91 +463,153 @@ pos_code_to_classes = {
 }
 
 
-def get_netid_lookup(data_dir):
-    """
-    Returns a map of gwids to netids.
-    """
-    netid_map = {}
-    with codecs.open(os.path.join(data_dir, "vivo_demographic.txt"), 'r', encoding="utf-8") as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            netid_map[row["EMPLOYEEID"]] = row["NETID"]
-    return netid_map
-
-
-def demographic_intersection(gwids, data_dir):
-    """
-    Returns the intersection of a provided list of gwids and the gwids in banner
-    demographic data.
-    """
-    demo_gwids = set()
-    with codecs.open(os.path.join(data_dir, "vivo_demographic.txt"), 'r', encoding="utf-8") as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            demo_gwids.add(row["EMPLOYEEID"])
-    return list(demo_gwids.intersection(gwids))
-
-
-def get_non_faculty_gwids(data_dir, non_fac_limit=None):
-    """
-    Returns the list of non-faculty gwids.
-
-    This is determined by taking the intersection of gwids in banner
-    demographic data and gwids in mygw data and
-    removing all faculty gwids.
-    """
-    mygw_gwids = []
-    for result in xml_result_generator(os.path.join(data_dir, "mygw_users.xml")):
-        mygw_gwids.append(result["gw_id"])
-
-    # Only gwids with demographic data
-    demo_gwids = demographic_intersection(mygw_gwids, data_dir)
-    # Not faculty gwids
-    fac_gwids = get_faculty_gwids(data_dir)
-    gwids = [gw_id for gw_id in demo_gwids if gw_id not in fac_gwids]
-    if non_fac_limit is not None and len(gwids) > non_fac_limit:
-        return gwids[:non_fac_limit]
-    else:
-        return gwids
-
-
-def get_faculty_gwids(data_dir, fac_limit=None):
-    """
-    Returns the list of faculty gwids.
-    This is determined by taking the intersection of gwids in banner
-    demographic data and fis_faculty in certain roles.
-    """
-    gwids = set()
-    # fis faculty
-    for result in xml_result_generator(os.path.join(data_dir, "fis_faculty.xml")):
-        if result["role"] in ("Dean", "Dep Head", "Provost", "Faculty", "Faculty-COI", "CLAD"):
-            gwids.add(result["gw_id"])
-    demo_gwids = demographic_intersection(gwids, data_dir)
-    if fac_limit is not None and len(demo_gwids) > fac_limit:
-        return demo_gwids[:fac_limit]
-    else:
-        return demo_gwids
-
-
-def mediaexpert_intersection(gwids, data_dir):
-    """
-    Returns the intersection of a provided list of gwids and the gwids in mediaexpert data.
-    """
-    mediaexpert_gwids = set()
-    for result in xml_result_generator(os.path.join(data_dir, "mygw_mediaexperts.xml")):
-        mediaexpert_gwids.add(result["gw_id"])
-    return list(mediaexpert_gwids.intersection(gwids))
-
-
-def get_skip_name_gwids(data_dir):
-    """
-    Returns the list of gwids for mediaexperts that have names.
-    """
-    skip_name_gwids = set()
-    for result in xml_result_generator(os.path.join(data_dir, "mygw_mediaexperts.xml")):
-        if result["last_name"]:
-            skip_name_gwids.add(result["gw_id"])
-    return list(skip_name_gwids)
+class DataContext:
+    """
+    The lookups derived from the data files, shared by everything in a run.
+
+    Each data file is scanned at most once, the first time that one of its lookups is needed, and all of the lookups
+    from the file are built in that pass.
+    """
+    # Roles in fis_faculty that make a person faculty
+    faculty_roles = ("Dean", "Dep Head", "Provost", "Faculty", "Faculty-COI", "CLAD")
+
+    def __init__(self, data_dir):
+        """
+        :param data_dir: the directory containing the data files
+        """
+        self.data_dir = data_dir
+        self._netid_lookup = None
+        self._demographic_gwids = None
+        self._fis_faculty_roles = None
+        self._fis_role_counts = None
+        self._mygw_gwids = None
+        self._mediaexpert_gwids = None
+        self._skip_name_gwids = None
+        self._faculty_gwids = None
+        self._non_faculty_gwids = None
+
+    def netid_lookup(self):
+        """
+        Returns a map of gwids to netids.
+        """
+        if self._netid_lookup is None:
+            self._scan_demographic()
+        return self._netid_lookup
+
+    def demographic_gwids(self):
+        """
+        Returns the GwidSet of gwids in banner demographic data.
+        """
+        if self._demographic_gwids is None:
+            self._scan_demographic()
+        return self._demographic_gwids
+
+    def fis_faculty_gwids(self, roles):
+        """
+        Returns the GwidSet of gwids in fis_faculty with any of the provided roles, in the order of fis_faculty.
+        """
+        if self._fis_faculty_roles is None:
+            self._scan_fis_faculty()
+        roles = set(roles)
+        return GwidSet(gw_id for gw_id, gw_id_roles in self._fis_faculty_roles.iteritems() if gw_id_roles & roles)
+
+    def fis_role_counts(self):
+        """
+        Returns a Counter of the roles of the rows in fis_faculty.
+        """
+        if self._fis_role_counts is None:
+            self._scan_fis_faculty()
+        return self._fis_role_counts
+
+    def mygw_gwids(self):
+        """
+        Returns the GwidSet of gwids in mygw users.
+        """
+        if self._mygw_gwids is None:
+            self._mygw_gwids = GwidSet()
+            for result in xml_result_generator(os.path.join(self.data_dir, "mygw_users.xml"), fields=("gw_id",)):
+                self._mygw_gwids.add(result["gw_id"])
+        return self._mygw_gwids
+
+    def mediaexpert_gwids(self):
+        """
+        Returns the GwidSet of gwids in mediaexpert data.
+        """
+        if self._mediaexpert_gwids is None:
+            self._scan_mediaexperts()
+        return self._mediaexpert_gwids
+
+    def skip_name_gwids(self):
+        """
+        Returns the GwidSet of gwids for mediaexperts that have names.
+        """
+        if self._skip_name_gwids is None:
+            self._scan_mediaexperts()
+        return self._skip_name_gwids
+
+    def demographic_intersection(self, gwids):
+        """
+        Returns the intersection of provided gwids and the gwids in banner
+        demographic data, as a GwidSet in the order of the provided gwids.
+        """
+        return gwid_set(gwids).intersection(self.demographic_gwids())
+
+    def mediaexpert_intersection(self, gwids):
+        """
+        Returns the intersection of provided gwids and the gwids in mediaexpert data, as a GwidSet in the order
+        of the provided gwids.
+        """
+        return gwid_set(gwids).intersection(self.mediaexpert_gwids())
+
+    def faculty_gwids(self, fac_limit=None):
+        """
+        Returns the GwidSet of faculty gwids, in the order of fis_faculty.
+        This is determined by taking the intersection of gwids in banner
+        demographic data and fis_faculty in certain roles.
+        """
+        if self._faculty_gwids is None:
+            self._faculty_gwids = self.demographic_intersection(self.fis_faculty_gwids(self.faculty_roles))
+        return self._faculty_gwids.limit(fac_limit)
+
+    def non_faculty_gwids(self, non_fac_limit=None):
+        """
+        Returns the GwidSet of non-faculty gwids, in the order of mygw users.
+
+        This is determined by taking the intersection of gwids in banner
+        demographic data and gwids in mygw data and
+        removing all faculty gwids.
+        """
+        if self._non_faculty_gwids is None:
+            # Only gwids with demographic data
+            demo_gwids = self.demographic_intersection(self.mygw_gwids())
+            # Not faculty gwids
+            self._non_faculty_gwids = demo_gwids - self.faculty_gwids()
+        return self._non_faculty_gwids.limit(non_fac_limit)
+
+    def _scan_demographic(self):
+        self._netid_lookup = {}
+        self._demographic_gwids = GwidSet()
+        for row in banner_result_generator(os.path.join(self.data_dir, "vivo_demographic.txt"),
+                                           fields=("EMPLOYEEID", "NETID")):
+            self._netid_lookup[row["EMPLOYEEID"]] = row["NETID"]
+            self._demographic_gwids.add(row["EMPLOYEEID"])
+
+    def _scan_fis_faculty(self):
+        # Ordered, so that the gwids are in the order of fis_faculty
+        self._fis_faculty_roles = OrderedDict()
+        self._fis_role_counts = Counter()
+        for result in xml_result_generator(os.path.join(self.data_dir, "fis_faculty.xml"), fields=("gw_id", "role")):
+            self._fis_faculty_roles.setdefault(result["gw_id"], set()).add(result["role"])
+            self._fis_role_counts[result["role"]] += 1
+
+    def _scan_mediaexperts(self):
+        self._mediaexpert_gwids = GwidSet()
+        self._skip_name_gwids = GwidSet()
+        for result in xml_result_generator(os.path.join(self.data_dir, "mygw_mediaexperts.xml"),
+                                           fields=("gw_id", "last_name")):
+            self._mediaexpert_gwids.add(result["gw_id"])
+            if result["last_name"]:
+                self._skip_name_gwids.add(result["gw_id"])
 
 
 def format_phone_number(phone_number):
@@ -392,31 +620,37 @@ def format_phone_number(phone_number):
     return None
 
 
-def frommysqlxml(filename):
-    return MySqlXmlView(filename)
+def frommysqlxml(filename, fields=None):
+    return MySqlXmlView(filename, fields)
 
 etl.frommysqlxml = frommysqlxml
 
 
+def frombannercsv(filename, fields=None):
+    return BannerCsvView(filename, fields)
+
+etl.frombannercsv = frombannercsv
+
+
 class MySqlXmlView(Table):
-    def __init__(self, filename):
+    def __init__(self, filename, fields=None):
+        self.filename = filename
+        self.fields = fields
+
+    def __iter__(self):
+        rows = xml_table(self.filename, self.fields)
+        field_names = next(rows)
+        # A file without rows has no field names.
+        if field_names:
+            yield field_names
+            for row in rows:
+                yield [unicode(value) if value is not None else None for value in row]
+
+
+class BannerCsvView(Table):
+    def __init__(self, filename, fields=None):
         self.filename = filename
+        self.fields = fields
 
     def __iter__(self):
-        yielded_field_names = False
-        for event, row_elem in etree.iterparse(self.filename, tag="row", recover=True):
-            field_names = []
-            values = []
-            for field_elem in row_elem.iter("field"):
-                if "xsi:nil" in field_elem.attrib or not field_elem.text:
-                    value = None
-                else:
-                    # Strip whitespace
-                    value = unicode(field_elem.text).strip()
-                field_names.append(field_elem.get("name"))
-                values.append(value)
-            row_elem.clear()
-            if not yielded_field_names:
-                yield field_names
-                yielded_field_names = True
-            yield values
+        return banner_table(self.filename, self.fields)
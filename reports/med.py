@@ -20,11 +20,12 @@ def process(pub_type):
         os.mkdir(output_dir)
 
     demographics = (etl
-                    .fromcsv("../data/vivo_demographic.txt", delimiter="|")
+                    .frombannercsv("../data/vivo_demographic.txt",
+                                   fields=("EMPLOYEEID", "FIRST_NAME", "MIDDLE_NAME", "LAST_NAME"))
                     .cut("EMPLOYEEID", "FIRST_NAME", "MIDDLE_NAME", "LAST_NAME")
                     .rename({"FIRST_NAME": "first_name", "MIDDLE_NAME": "middle_name", "LAST_NAME": "last_name"}))
     limited_faculty = (etl
-                       .frommysqlxml("../data/fis_faculty.xml")
+                       .frommysqlxml("../data/fis_faculty.xml", fields=("gw_id", "home_department", "home_college"))
                        .selectin("home_college", (u'School of Medicine and Health Sciences',
                                                   u'Milken Institute School of Public Health',
                                                   u'School of Nursing'))
@@ -1,23 +1,24 @@
 import sys
 import os
 sys.path.append(os.path.abspath('..'))
-from loader.utility import xml_result_generator, valid_department_name, valid_college_name
-import codecs
-import csv
+from loader.utility import xml_result_generator, banner_result_generator, valid_department_name, valid_college_name, \
+    DataContext
+from loader.gwids import GwidSet
 import argparse
-from collections import Counter
 
-def fis_appointments_with_invalid_college_or_department(data_dir):
-    valid_gwids = set()
-    invalid_gwids = set()
-    for result in xml_result_generator(os.path.join(data_dir, "fis_academic_appointment.xml")):
+def fis_appointments_with_invalid_college_or_department(context):
+    valid_gwids = GwidSet()
+    invalid_gwids = GwidSet()
+    for result in xml_result_generator(os.path.join(context.data_dir, "fis_academic_appointment.xml"),
+                                       fields=("gw_id", "department", "college")):
         if valid_department_name(result["department"]) or valid_college_name(result["college"]):
             valid_gwids.add(result["gw_id"])
             if result["gw_id"] in invalid_gwids:
                 invalid_gwids.remove(result["gw_id"])
         elif result["gw_id"] not in valid_gwids:
             invalid_gwids.add(result["gw_id"])
-    for result in xml_result_generator(os.path.join(data_dir, "fis_admin_appointment.xml")):
+    for result in xml_result_generator(os.path.join(context.data_dir, "fis_admin_appointment.xml"),
+                                       fields=("gw_id", "department", "college")):
         if valid_department_name(result["department"]) or valid_college_name(result["college"]):
             valid_gwids.add(result["gw_id"])
             if result["gw_id"] in invalid_gwids:
@@ -27,134 +28,120 @@ def fis_appointments_with_invalid_college_or_department(data_dir):
     return invalid_gwids
 
 
-def fis_faculty_with_no_appointments(data_dir):
-    fis_faculty_gwids = load_fis_faculty(data_dir)
-    fis_appointment_gwids = load_fis_appointments(data_dir)
+def fis_faculty_with_no_appointments(context):
+    fis_faculty_gwids = load_fis_faculty(context)
+    fis_appointment_gwids = load_fis_appointments(context)
     return fis_faculty_gwids - fis_appointment_gwids
 
 
-def fis_faculty_with_no_appointments_and_in_banner(data_dir):
-    fis_faculty_gwids = load_fis_faculty(data_dir)
-    fis_appointment_gwids = load_fis_appointments(data_dir)
-    banner_gwids = load_banner_demographic(data_dir)
+def fis_faculty_with_no_appointments_and_in_banner(context):
+    fis_faculty_gwids = load_fis_faculty(context)
+    fis_appointment_gwids = load_fis_appointments(context)
+    banner_gwids = load_banner_demographic(context)
 
     return (fis_faculty_gwids - fis_appointment_gwids).intersection(banner_gwids)
 
 
-def fis_faculty_not_in_banner(data_dir):
-    fis_gwids = load_fis_faculty(data_dir)
-    banner_gwids = load_banner_demographic(data_dir)
+def fis_faculty_not_in_banner(context):
+    fis_gwids = load_fis_faculty(context)
+    banner_gwids = load_banner_demographic(context)
 
     return fis_gwids - banner_gwids
 
 
-def fis_faculty_in_banner(data_dir):
-    fis_gwids = load_fis_faculty(data_dir)
-    banner_gwids = load_banner_demographic(data_dir)
+def fis_faculty_in_banner(context):
+    fis_gwids = load_fis_faculty(context)
+    banner_gwids = load_banner_demographic(context)
 
     return fis_gwids.intersection(banner_gwids)
 
 
-def fis_appointments_not_in_banner_demographic(data_dir):
-    fis_gwids = load_fis_appointments(data_dir)
-    banner_gwids = load_banner_demographic(data_dir)
+def fis_appointments_not_in_banner_demographic(context):
+    fis_gwids = load_fis_appointments(context)
+    banner_gwids = load_banner_demographic(context)
     return fis_gwids - banner_gwids
 
 
-def fis_appointments_not_in_banner_appointments_in_banner_demographics(data_dir):
-    fis_gwids = load_fis_appointments(data_dir)
-    banner_demographic_gwids = load_banner_demographic(data_dir)
-    banner_appointment_gwids = load_banner_appointment(data_dir)
+def fis_appointments_not_in_banner_appointments_in_banner_demographics(context):
+    fis_gwids = load_fis_appointments(context)
+    banner_demographic_gwids = load_banner_demographic(context)
+    banner_appointment_gwids = load_banner_appointment(context)
     return fis_gwids.intersection(banner_demographic_gwids) - banner_appointment_gwids
 
 
-def fis_faculty_and_banner_demographics_intersection(data_dir):
-    fis_gwids = load_fis_faculty(data_dir)
-    banner_demographic_gwids = load_banner_demographic(data_dir)
+def fis_faculty_and_banner_demographics_intersection(context):
+    fis_gwids = load_fis_faculty(context)
+    banner_demographic_gwids = load_banner_demographic(context)
     return fis_gwids.intersection(banner_demographic_gwids)
 
 
-def fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments(data_dir):
-    fis_gwids = load_fis_faculty(data_dir)
-    banner_demographic_gwids = load_banner_demographic(data_dir)
+def fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments(context):
+    fis_gwids = load_fis_faculty(context)
+    banner_demographic_gwids = load_banner_demographic(context)
     gwids = fis_gwids.intersection(banner_demographic_gwids)
-    banner_appointment_gwids = load_banner_appointment(data_dir)
+    banner_appointment_gwids = load_banner_appointment(context)
     return gwids - banner_appointment_gwids
 
 
-def fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments_or_fis_appointments(data_dir):
-    return fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments(data_dir) - \
-           load_fis_appointments(data_dir)
+def fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments_or_fis_appointments(context):
+    return fis_faculty_and_banner_demographics_intersection_not_in_banner_appointments(context) - \
+           load_fis_appointments(context)
 
 
-def fis_appointments(data_dir):
-    return load_banner_appointment(data_dir)
+def fis_appointments(context):
+    return load_banner_appointment(context)
 
 
-def fis_appointments_in_banner_demographics(data_dir):
-    return load_banner_appointment(data_dir).intersection(load_banner_demographic(data_dir))
+def fis_appointments_in_banner_demographics(context):
+    return load_banner_appointment(context).intersection(load_banner_demographic(context))
 
 
-def fis_faculty_and_banner_appointments_intersection(data_dir):
-    return load_banner_appointment(data_dir).intersection(load_fis_faculty(data_dir))
+def fis_faculty_and_banner_appointments_intersection(context):
+    return load_banner_appointment(context).intersection(load_fis_faculty(context))
 
 
-def fis_faculty_roles(data_dir):
-    roles = Counter()
-    for result in xml_result_generator(os.path.join(data_dir, "fis_faculty.xml")):
-        roles[result["role"]] += 1
-    return roles
+def fis_faculty_roles(context):
+    return context.fis_role_counts()
 
 
-def match_job_title(data_dir, gwids):
+def match_job_title(context, gwids):
     gwid_map = {}
-    job_title_map = load_banner_job_titles(data_dir)
+    job_title_map = load_banner_job_titles(context)
     for gwid in gwids:
         gwid_map[gwid] = job_title_map.get(gwid)
     return gwid_map
 
 
-def load_fis_faculty(data_dir):
-    gwids = set()
-    for result in xml_result_generator(os.path.join(data_dir, "fis_faculty.xml")):
-        if result["role"] in ("Dean", "Dep Head", "Provost", "Faculty"):
-            gwids.add(result["gw_id"])
-    return gwids
+def load_fis_faculty(context):
+    return context.fis_faculty_gwids(("Dean", "Dep Head", "Provost", "Faculty"))
 
 
-def load_fis_appointments(data_dir):
-    gwids = set()
-    for result in xml_result_generator(os.path.join(data_dir, "fis_academic_appointment.xml")):
+def load_fis_appointments(context):
+    gwids = GwidSet()
+    for result in xml_result_generator(os.path.join(context.data_dir, "fis_academic_appointment.xml"),
+                                       fields=("gw_id",)):
         gwids.add(result["gw_id"])
-    for result in xml_result_generator(os.path.join(data_dir, "fis_admin_appointment.xml")):
+    for result in xml_result_generator(os.path.join(context.data_dir, "fis_admin_appointment.xml"), fields=("gw_id",)):
         result["gw_id"]
     return gwids
 
 
-def load_banner_demographic(data_dir):
-    gwids = set()
-    with codecs.open(os.path.join(data_dir, "vivo_demographic.txt"), 'r', encoding="utf-8") as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            gwids.add(row["EMPLOYEEID"])
-    return gwids
+def load_banner_demographic(context):
+    return context.demographic_gwids()
 
 
-def load_banner_appointment(data_dir):
-    gwids = set()
-    with codecs.open(os.path.join(data_dir, "vivo_acadappt.txt"), 'r', encoding="utf-8") as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            gwids.add(row["EMPLOYEEID"])
+def load_banner_appointment(context):
+    gwids = GwidSet()
+    for row in banner_result_generator(os.path.join(context.data_dir, "vivo_acadappt.txt"), fields=("EMPLOYEEID",)):
+        gwids.add(row["EMPLOYEEID"])
     return gwids
 
 
-def load_banner_job_titles(data_dir):
+def load_banner_job_titles(context):
     jobs = {}
-    with codecs.open(os.path.join(data_dir, "vivo_emplappt.txt"), 'r', encoding="utf-8") as csv_file:
-        reader = csv.DictReader(csv_file, dialect="banner")
-        for row in reader:
-            jobs[row["EMPLOYEEID"]] = row["JOB_TITLE"]
+    for row in banner_result_generator(os.path.join(context.data_dir, "vivo_emplappt.txt"),
+                                       fields=("EMPLOYEEID", "JOB_TITLE")):
+        jobs[row["EMPLOYEEID"]] = row["JOB_TITLE"]
     return jobs
 
 
@@ -191,9 +178,10 @@ if __name__ == "__main__":
                         help="The report to run.")
 
     args = parser.parse_args()
-    main_result = reports[args.report_type](args.data_dir)
+    context = DataContext(args.data_dir)
+    main_result = reports[args.report_type](context)
     if args.job:
-        main_result = match_job_title(args.data_dir, main_result)
+        main_result = match_job_title(context, main_result)
 
     if args.file:
         with open("{}.txt".format(args.report_type), 'w') as f: